@@ -0,0 +1,151 @@
+'''
+Encoder benchmark, run on the keyboard from the REPL:
+
+    import encoder_bench
+    encoder_bench.run()
+
+Turns both encoder types by 1000 detents through EncoderHandler, fed from
+stand-in pins and counters instead of the board's, and prints the time and
+the bytes allocated per 1000 detents as one line of JSON per case. The
+handler hands the detents to a key taking them all at once, so the numbers
+are the encoder's own and not those of sending keys.
+
+Allocations are counted with gc.mem_alloc(), which CPython doesn't have,
+alloc_bytes is null there.
+'''
+import gc
+import json
+import sys
+import time
+
+from kmk.modules.encoder import Encoder, EncoderHandler, RotaryioEncoder
+
+# Pin states (a << 1 | b) of one detent clockwise, from both pins high
+_CW = (1, 0, 2, 3)
+
+
+class StubPin:
+    def __init__(self):
+        self.value = True
+
+    def get_value(self):
+        return self.value
+
+
+class StubCounter:
+    def __init__(self):
+        self.position = 0
+
+
+class ScriptedEncoder(Encoder):
+    def _init_rotation(self, pin_a, pin_b):
+        self.pin_a = StubPin()
+        self.pin_b = StubPin()
+        self._state = 3
+
+    def turn(self, detents):
+        pin_a = self.pin_a
+        pin_b = self.pin_b
+        for _ in range(detents):
+            for state in _CW:
+                pin_a.value = state >> 1
+                pin_b.value = state & 1
+                self.update_state()
+
+
+class ScriptedRotaryioEncoder(RotaryioEncoder):
+    def _init_rotation(self, pin_a, pin_b):
+        self.encoder = StubCounter()
+        self._state = 0
+
+    def turn(self, detents, per_update=1):
+        counter = self.encoder
+        for _ in range(detents // per_update):
+            counter.position += per_update
+            self.update_state()
+
+
+class _Key:
+    '''A key taking all detents at once, like MIDI_CC.'''
+
+    def __init__(self):
+        self.meta = self
+        self.steps = 0
+
+    def on_encoder_move(self, key, keyboard, steps):
+        self.steps += steps
+
+
+class _Keyboard:
+    active_layers = [0]
+    debug_enabled = False
+
+
+def _handler(encoder_class):
+    key = _Key()
+    keyboard = _Keyboard()
+    handler = EncoderHandler()
+    handler._keyboard = keyboard
+    handler.map = (((key, key, None),),)
+    encoder = encoder_class(None, None)
+    encoder.encoder_state.encoder_id = 0
+    encoder.on_move_do = handler._on_move
+    handler.encoders.append(encoder)
+    return encoder, key
+
+
+def _allocated(func):
+    mem_alloc = getattr(gc, 'mem_alloc', None)
+    if mem_alloc is None:
+        func()
+        return None
+    gc.collect()
+    gc.disable()
+    try:
+        before = mem_alloc()
+        func()
+        return mem_alloc() - before
+    finally:
+        gc.enable()
+
+
+def _report(result):
+    print(json.dumps(result))
+    return result
+
+
+def bench(name, encoder_class, detents=1000, **turn_args):
+    encoder, key = _handler(encoder_class)
+    # Warm up, the first detent creates what's reused afterwards
+    encoder.turn(4, **turn_args)
+    key.steps = 0
+
+    start = time.monotonic_ns()
+    encoder.turn(detents, **turn_args)
+    elapsed_ns = time.monotonic_ns() - start
+    steps = key.steps
+    alloc = _allocated(lambda: encoder.turn(detents, **turn_args))
+    return _report({
+        'bench': name,
+        'detents': detents,
+        'steps_seen': steps,
+        'alloc_bytes': alloc,
+        'us_per_detent': elapsed_ns / detents / 1000,
+    })
+
+
+def run(detents=1000):
+    '''
+    Runs all cases and returns the results, which are also printed as one
+    JSON object per line.
+    '''
+    return [
+        _report({
+            'bench': 'meta',
+            'platform': sys.platform,
+            'implementation': sys.implementation.name,
+        }),
+        bench('encoder.gpio', ScriptedEncoder, detents),
+        bench('encoder.rotaryio', ScriptedRotaryioEncoder, detents),
+        bench('encoder.rotaryio_10_per_poll', ScriptedRotaryioEncoder, detents, per_update=10),
+    ]
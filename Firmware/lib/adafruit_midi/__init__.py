@@ -26,7 +26,7 @@ Implementation Notes
 
 """
 
-from .midi_message import MIDIMessage
+from .midi_message import MIDIEvent, MIDIMessage
 
 __version__ = "1.4.5"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_MIDI.git"
@@ -48,6 +48,8 @@ class MIDI:
         used by ``send`` if no channel is specified,
         defaults to 0 (MIDI Channel 1).
     :param int in_buf_size: Maximum size of input buffer in bytes, default 30.
+    :param sysex_stream: A `SystemExclusiveStream` to hand SysEx data to as it
+        arrives, so it doesn't have to fit the input buffer, default None.
     :param bool debug: Debug mode, default False.
 
     """
@@ -60,6 +62,7 @@ class MIDI:
         in_channel=None,
         out_channel=0,
         in_buf_size=30,
+        sysex_stream=None,
         debug=False
     ):
         if midi_in is None and midi_out is None:
@@ -71,9 +74,14 @@ class MIDI:
         self._out_channel = out_channel
         self.out_channel = out_channel
         self._debug = debug
-        # This input buffer holds what has been read from midi_in
-        self._in_buf = bytearray(0)
+        # This input buffer holds what has been read from midi_in, unparsed
+        # bytes are _in_buf[_in_start:_in_end]
+        self._in_buf = bytearray(in_buf_size)
+        self._in_view = memoryview(self._in_buf)
+        self._in_start = 0
+        self._in_end = 0
         self._in_buf_size = in_buf_size
+        self._sysex_stream = sysex_stream
         self._outbuf = bytearray(4)
         self._skipped_bytes = 0
 
@@ -117,27 +125,125 @@ class MIDI:
         :returns MIDIMessage object: Returns object or None for nothing.
         """
         ### could check _midi_in is an object OR correct object OR correct interface here?
+        self._read_in()
+        # msg could still be None at this point, e.g. in middle of monster SysEx
+        return self._parse_next()
+
+    def receive_into(self, messages, max_messages=None):
+        """Read messages from MIDI port like `receive` does, then parse every
+        complete message in the input buffer in one go.
+
+        :param list messages: Parsed messages are appended to it.
+        :param int max_messages: Stop after this many, default all.
+        :returns int: The number of messages appended.
+        """
+        self._read_in()
+        count = 0
+        while max_messages is None or count < max_messages:
+            start = self._in_start
+            msg = self._parse_next()
+            if msg is not None:
+                messages.append(msg)
+                count += 1
+            elif self._in_start == start or self._in_start == self._in_end:
+                break
+        return count
+
+    def receive_event(self, event):
+        """Like `receive`, but fills in the reusable `MIDIEvent` record
+        ``event`` instead of creating a message object.
+
+        :returns MIDIEvent: Returns event or None for nothing.
+        """
+        self._read_in()
+        return self._parse_next(event)
+
+    def receive_events(self, events):
+        """Like `receive_into`, but fills in the reusable `MIDIEvent` records
+        of ``events`` in order, as many as there are complete messages.
+
+        :param list events: Pool of `MIDIEvent` records.
+        :returns int: The number of records filled in.
+        """
+        self._read_in()
+        count = 0
+        while count < len(events):
+            start = self._in_start
+            if self._parse_next(events[count]) is not None:
+                count += 1
+            elif self._in_start == start or self._in_start == self._in_end:
+                break
+        return count
+
+    def _read_in(self):
         # If the buffer here is not full then read as much as we can fit from
-        # the input port
-        if len(self._in_buf) < self._in_buf_size:
-            bytes_in = self._midi_in.read(self._in_buf_size - len(self._in_buf))
-            if bytes_in:
-                if self._debug:
-                    print("Receiving: ", [hex(i) for i in bytes_in])
-                self._in_buf.extend(bytes_in)
-                del bytes_in
+        # the input port. Unparsed bytes are moved to the front first, so all
+        # of in_buf_size is free for a message to be completed in, as when the
+        # buffer was resliced after every message.
+        start = self._in_start
+        end = self._in_end
+        size = self._in_buf_size
+        if start:
+            self._in_view[0 : end - start] = self._in_view[start:end]
+            end -= start
+            self._in_start = 0
+        if end == size:
+            self._in_end = end
+            return
+
+        if hasattr(self._midi_in, "readinto"):
+            num = self._midi_in.readinto(self._in_view[end:], size - end)
+        else:
+            bytes_in = self._midi_in.read(size - end)
+            num = len(bytes_in) if bytes_in else 0
+            if num:
+                self._in_view[end : end + num] = bytes_in
+            del bytes_in
+        if num:
+            if self._debug:
+                print("Receiving: ", [hex(i) for i in self._in_buf[end : end + num]])
+            end += num
+        self._in_end = end
+
+    def _stream_sysex(self):
+        # Hands over SysEx bytes at the start of the input buffer, skipping
+        # leading data bytes just like the regular parser, for as long as one
+        # SysEx follows another
+        buf = self._in_buf
+        start = self._in_start
+        end = self._in_end
+        while start < end:
+            if not self._sysex_stream.active:
+                i = start
+                while i < end and not buf[i] & 0x80:
+                    i += 1
+                if i == end or buf[i] != 0xF0:
+                    break
+                self._skipped_bytes += i - start
+                start = i
+            start = self._sysex_stream.feed(self._in_view, start, end)
+            if self._sysex_stream.active:
+                break
+        if start >= end:
+            self._in_start = 0
+            self._in_end = 0
+        else:
+            self._in_start = start
 
+    def _parse_next(self, event=None):
+        if self._sysex_stream is not None:
+            self._stream_sysex()
         (msg, endplusone, skipped) = MIDIMessage.from_message_bytes(
-            self._in_buf, self._in_channel
+            self._in_view, self._in_channel, self._in_start, self._in_end, event
         )
-        if endplusone != 0:
-            # This is not particularly efficient as it's copying most of bytearray
-            # and deleting old one
-            self._in_buf = self._in_buf[endplusone:]
+        if endplusone >= self._in_end:
+            # Everything parsed, start over at the front of the buffer
+            self._in_start = 0
+            self._in_end = 0
+        else:
+            self._in_start = endplusone
 
         self._skipped_bytes += skipped
-
-        # msg could still be None at this point, e.g. in middle of monster SysEx
         return msg
 
     def send(self, msg, channel=None):
@@ -161,6 +267,59 @@ class MIDI:
 
         self._send(data, len(data))
 
+    def send_note_on(self, note, velocity=127, channel=None):
+        """Sends a Note On without creating a message object.
+
+        :param int note: The note (key) number, 0-127.
+        :param int velocity: The strike velocity, 0-127.
+        :param int channel: Channel number, if not set the ``out_channel`` will be used.
+        """
+        self._send_channel_message(0x90, note, velocity, channel)
+
+    def send_note_off(self, note, velocity=0, channel=None):
+        """Sends a Note Off without creating a message object.
+
+        :param int note: The note (key) number, 0-127.
+        :param int velocity: The release velocity, 0-127.
+        :param int channel: Channel number, if not set the ``out_channel`` will be used.
+        """
+        self._send_channel_message(0x80, note, velocity, channel)
+
+    def send_control_change(self, control, value, channel=None):
+        """Sends a Control Change without creating a message object.
+
+        :param int control: The control number, 0-127.
+        :param int value: The 7bit value of the control, 0-127.
+        :param int channel: Channel number, if not set the ``out_channel`` will be used.
+        """
+        self._send_channel_message(0xB0, control, value, channel)
+
+    def send_realtime(self, status):
+        """Sends a single byte System Real-Time message, e.g. 0xF8 for Timing Clock,
+        without creating a message object.
+
+        :param int status: The status byte, 0xF8-0xFF.
+        """
+        if not 0xF8 <= status <= 0xFF:
+            raise ValueError("Not a real-time status byte")
+        outbuf = self._outbuf
+        outbuf[0] = status
+        self._send(outbuf, 1)
+
+    def _send_channel_message(self, status, data1, data2, channel):
+        # Encodes into the preallocated output buffer
+        if channel is None:
+            channel = self._out_channel
+        elif not 0 <= channel <= 15:
+            raise ValueError("Channel must be 0-15 or None")
+        if not 0 <= data1 <= 127 or not 0 <= data2 <= 127:
+            raise ValueError("Out of range")
+        outbuf = self._outbuf
+        outbuf[0] = status | channel
+        outbuf[1] = data1
+        outbuf[2] = data2
+        self._send(outbuf, 3)
+
     def _send(self, packet, num):
         if self._debug:
             print("Sending: ", [hex(i) for i in packet[:num]])
@@ -97,6 +97,11 @@ class MIDIMessage:
     # order is more specific masks first
     _statusandmask_to_class = []
 
+    # The same, resolved for every status byte value: class and its LENGTH
+    # or None and 0 for unknown statuses
+    _status_to_class = [None] * 256
+    _status_to_length = [0] * 256
+
     def __init__(self, *, channel=None):
         self._channel = channel  # dealing with pylint inadequacy
         self.channel = channel
@@ -130,6 +135,14 @@ class MIDIMessage:
             insert_idx, ((cls._STATUS, cls._STATUSMASK), cls)
         )
 
+        # More specific masks win, as in the ordered list above
+        for status in range(0x80, 0x100):
+            if status & cls._STATUSMASK == cls._STATUS:
+                current = MIDIMessage._status_to_class[status]
+                if current is None or cls._STATUSMASK > current._STATUSMASK:
+                    MIDIMessage._status_to_class[status] = cls
+                    MIDIMessage._status_to_length[status] = cls.LENGTH
+
     # pylint: disable=too-many-arguments
     @classmethod
     def _search_eom_status(cls, buf, eom_status, msgstartidx, msgendidxplusone, endidx):
@@ -156,24 +169,20 @@ class MIDIMessage:
 
     @classmethod
     def _match_message_status(cls, buf, msgstartidx, msgendidxplusone, endidx):
-        msgclass = None
         status = buf[msgstartidx]
-        known_msg = False
         complete_msg = False
         bad_termination = False
 
-        # Rummage through our list looking for a status match
-        for status_mask, msgclass in MIDIMessage._statusandmask_to_class:
-            masked_status = status & status_mask[1]
-            if status_mask[0] == masked_status:
-                known_msg = True
-                # Check there's enough left to parse a complete message
-                # this value can be changed later for a var. length msgs
-                complete_msg = len(buf) - msgstartidx >= msgclass.LENGTH
-                if not complete_msg:
-                    break
-
-                if msgclass.LENGTH < 0:  # indicator of variable length message
+        # Single lookup in the table filled by register_message_type()
+        msgclass = MIDIMessage._status_to_class[status]
+        known_msg = msgclass is not None
+        if known_msg:
+            length = MIDIMessage._status_to_length[status]
+            # Check there's enough left to parse a complete message
+            # this value can be changed later for a var. length msgs
+            complete_msg = endidx + 1 - msgstartidx >= length
+            if complete_msg:
+                if length < 0:  # indicator of variable length message
                     (
                         msgendidxplusone,
                         terminated_msg,
@@ -184,8 +193,7 @@ class MIDIMessage:
                     if not terminated_msg:
                         complete_msg = False
                 else:  # fixed length message
-                    msgendidxplusone = msgstartidx + msgclass.LENGTH
-                break
+                    msgendidxplusone = msgstartidx + length
 
         return (
             msgclass,
@@ -198,20 +206,28 @@ class MIDIMessage:
 
     # pylint: disable=too-many-locals,too-many-branches
     @classmethod
-    def from_message_bytes(cls, midibytes, channel_in):
+    def from_message_bytes(cls, midibytes, channel_in, start=0, end=None, event=None):
         """Create an appropriate object of the correct class for the
         first message found in some MIDI bytes filtered by channel_in.
 
+        Only ``midibytes[start:end]`` is looked at, ``end`` defaults to its length.
+        Messages are constructed from slices of ``midibytes``, pass a
+        ``memoryview`` to avoid copying.
+        If a `MIDIEvent` is passed as ``event``, it is filled in and returned in
+        place of a new message object.
+
         Returns (messageobject, endplusone, skipped)
         or for no messages, partial messages or messages for other channels
-        (None, endplusone, skipped).
+        (None, endplusone, skipped). endplusone is an index into midibytes.
         """
-        endidx = len(midibytes) - 1
+        if end is None:
+            end = len(midibytes)
+        endidx = end - 1
         skipped = 0
         preamble = True
 
-        msgstartidx = 0
-        msgendidxplusone = 0
+        msgstartidx = start
+        msgendidxplusone = start
         while True:
             msg = None
             # Look for a status byte
@@ -238,7 +254,11 @@ class MIDIMessage:
                 midibytes, msgstartidx, msgendidxplusone, endidx
             )
             channel_match_orna = True
-            if complete_message and not bad_termination:
+            if complete_message and not bad_termination and event is not None:
+                msg = event.decode(msgclass, midibytes, msgstartidx, msgendidxplusone)
+                if msg.channel is not None:
+                    channel_match_orna = channel_filter(msg.channel, channel_in)
+            elif complete_message and not bad_termination:
                 try:
                     msg = msgclass.from_bytes(midibytes[msgstartidx:msgendidxplusone])
                     if msg.channel is not None:
@@ -260,7 +280,10 @@ class MIDIMessage:
                     # yet complete - leave bytes in buffer and wait for more
                     break
             else:
-                msg = MIDIUnknownEvent(status)
+                if event is not None:
+                    msg = event.decode(MIDIUnknownEvent, midibytes, msgstartidx, msgstartidx + 1)
+                else:
+                    msg = MIDIUnknownEvent(status)
                 # length cannot be known
                 # next read will skip past leftover data bytes
                 msgendidxplusone = msgstartidx + 1
@@ -320,3 +343,76 @@ class MIDIBadEvent(MIDIMessage):
         self.data = bytes(msg_bytes)
         self.exception_text = repr(exception)
         super().__init__()
+
+
+class MIDIEvent:
+    """A reusable record of a received MIDI message, filled in by
+    `MIDI.receive_event` and `MIDI.receive_events` instead of creating
+    a message object per message. Only a message with a status byte where
+    data is expected goes through its class to be validated, so it is
+    rejected exactly when `MIDI.receive` would return a `MIDIBadEvent`.
+
+    * ``msgclass`` - the class the message would have been parsed as, e.g.
+      `NoteOn`, or `MIDIUnknownEvent` / `MIDIBadEvent`.
+    * ``status`` - the status byte, including the channel.
+    * ``channel`` - the channel for channel messages, otherwise None.
+    * ``data1``, ``data2`` - the data bytes of fixed length messages, 0 if absent,
+      e.g. note and velocity for `NoteOn`.
+    * ``length`` - length of the message including status.
+    * ``data`` - copy of a variable length or bad message, otherwise None.
+    * ``exception`` - what the class raised for a `MIDIBadEvent`, otherwise None.
+    """
+
+    def __init__(self):
+        self.msgclass = None
+        self.status = 0
+        self.channel = None
+        self.data1 = 0
+        self.data2 = 0
+        self.length = 0
+        self.data = None
+        self.exception = None
+
+    def decode(self, msgclass, buf, start, end):
+        """Fill the record from the message in ``buf[start:end]``."""
+        status = buf[start]
+        length = end - start
+        self.status = status
+        self.length = length
+        self.data1 = buf[start + 1] if length > 1 else 0
+        self.data2 = buf[start + 2] if length > 2 else 0
+        self.data = None
+        self.exception = None
+        if msgclass.LENGTH < 0 and msgclass is not MIDIUnknownEvent:
+            self.data = bytes(buf[start:end])
+        elif (self.data1 | self.data2) & 0x80:
+            # A status byte where data is expected: rare, and bad only if the
+            # class rejects it, e.g. PitchBend takes a high bit in its LSB
+            try:
+                msgclass.from_bytes(buf[start:end])
+            except (ValueError, TypeError) as ex:
+                msgclass = MIDIBadEvent
+                self.data = bytes(buf[start:end])
+                self.exception = ex
+        self.msgclass = msgclass
+        # Channel messages are the ones with the channel masked out
+        if msgclass._STATUSMASK == 0xF0:
+            self.channel = status & MIDIMessage.CHANNELMASK
+        else:
+            self.channel = None
+        return self
+
+    def to_message(self):
+        """Create the equivalent message object."""
+        if self.msgclass is MIDIUnknownEvent:
+            return MIDIUnknownEvent(self.status)
+        if self.msgclass is MIDIBadEvent:
+            return MIDIBadEvent(self.data, self.exception)
+        if self.data is not None:
+            msg_bytes = self.data
+        else:
+            msg_bytes = bytes((self.status, self.data1, self.data2)[: self.length])
+        try:
+            return self.msgclass.from_bytes(msg_bytes)
+        except (ValueError, TypeError) as ex:
+            return MIDIBadEvent(msg_bytes, ex)
@@ -60,3 +60,80 @@ class SystemExclusive(MIDIMessage):
 
 
 SystemExclusive.register_message_type()
+
+
+class SystemExclusiveStream:
+    """Streaming parser for System Exclusive messages of any length, which
+    works in constant memory. Pass it to :class:MIDI as ``sysex_stream`` and
+    SysEx data is handed to ``handler`` as it arrives, instead of
+    being parsed into `SystemExclusive` messages.
+
+    :param handler: Called as ``handler(manufacturer_id, chunk, last)``.
+        ``manufacturer_id`` and ``chunk`` are memoryviews only valid during the
+        call. ``last`` is None while more data follows, True for the final
+        chunk of a message ended by EOX (0xF7), False if another status
+        byte cut it short. ``chunk`` may be empty.
+
+    The scan state is kept between calls to `feed`, so every byte is only
+    looked at once. Real time messages inside a SysEx are left to the regular
+    parser and the SysEx resumes after them.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.active = False
+        self._id = bytearray(3)
+        self._id_view = memoryview(self._id)
+        self._id_len = 0
+        self._id_need = 1
+        # Statistics: messages finished, of which cut short, and data bytes
+        self.messages = 0
+        self.aborted = 0
+        self.data_bytes = 0
+
+    def feed(self, buf, start, end):
+        """Consume the SysEx bytes at the start of ``buf[start:end]``,
+        which must begin with 0xF0 unless a message is in progress.
+
+        :returns int: Index of the first byte not consumed.
+        """
+        i = start
+        if not self.active:
+            self.active = True
+            self._id_len = 0
+            self._id_need = 1
+            i += 1
+
+        # Manufacturer id, three bytes if the first is 0
+        while self._id_len < self._id_need:
+            if i == end or buf[i] & 0x80:
+                break
+            if self._id_len == 0 and buf[i] == 0:
+                self._id_need = 3
+            self._id[self._id_len] = buf[i]
+            self._id_len += 1
+            i += 1
+
+        data_start = i
+        while i < end and not buf[i] & 0x80:
+            i += 1
+
+        last = None
+        if i < end and buf[i] < 0xF8:
+            last = buf[i] == self.ENDSTATUS
+
+        if i > data_start or last is not None:
+            self.data_bytes += i - data_start
+            self.handler(self._id_view[: self._id_len], buf[data_start:i], last)
+
+        if last is not None:
+            self.active = False
+            self.messages += 1
+            if last:
+                i += 1
+            else:
+                # Leave the status byte to the regular parser
+                self.aborted += 1
+        return i
+
+    ENDSTATUS = SystemExclusive.ENDSTATUS
@@ -2,14 +2,98 @@ import neopixel
 
 import time
 from math import e, exp, pi, sin
+from supervisor import ticks_ms
 
 from kmk.extensions import Extension
 from kmk.handlers.stock import passthrough as handler_passthrough
 from kmk.keys import make_key
+from kmk.kmktime import ticks_add, ticks_diff
 
 rgb_config = {}
 
 
+def _hue_ramp():
+    '''
+    Per hue (0-359), how far the channel ramping between the other two is
+    below val, in sixtieths of the saturated part: 60 - hue % 60 in sectors
+    where it rises, hue % 60 where it falls. Dicts, not sequences, so the
+    lookup is also the range and type check, other keys raise KeyError.
+    '''
+    ramp = {}
+    for hue in range(360):
+        frac = hue % 60
+        ramp[hue] = frac if hue // 60 & 1 else 60 - frac
+    return ramp
+
+
+_HUE_RAMP = _hue_ramp()
+_SAT = {sat: sat for sat in range(101)}
+
+
+def _float_ramp(hue, sat, val):
+    # The ramping channel as the float conversion gave it
+    base = ((100 - sat) * val) / 100
+    color = (val - base) * ((hue % 60) / 60)
+    if hue // 60 % 2:
+        return int(val - color)
+    return int(base + color)
+
+
+def _float_hsv_to_rgb(hue, sat, val):
+    '''
+    The float conversion, for what the tables don't cover: hues with
+    fractions or out of 0-359, sat out of 0-100 and val out of 0-255.
+    '''
+    if sat == 0:
+        return int(val), int(val), int(val)
+    base = ((100 - sat) * val) / 100
+    color = (val - base) * ((hue % 60) / 60)
+    x = int(hue / 60)
+    if x == 0:
+        r, g, b = val, base + color, base
+    elif x == 1:
+        r, g, b = val - color, val, base
+    elif x == 2:
+        r, g, b = base, val, base + color
+    elif x == 3:
+        r, g, b = base, val - color, val
+    elif x == 4:
+        r, g, b = base + color, base, val
+    elif x == 5:
+        r, g, b = val, base, val - color
+    else:
+        r = g = b = 0
+    return int(r), int(g), int(b)
+
+
+class ColorProfile:
+    '''
+    Output calibration: gamma and scale (white balance) per R, G and B
+    channel, turned into lookup tables the output is built through.
+    :param gamma: exponent, or (r, g, b) exponents
+    :param scale: (r, g, b) factors applied after gamma, 0.0-1.0
+    '''
+
+    def __init__(self, gamma=1.0, scale=(1.0, 1.0, 1.0)):
+        if not isinstance(gamma, (tuple, list)):
+            gamma = (gamma, gamma, gamma)
+        self.gamma = gamma
+        self.scale = scale
+
+    def tables(self):
+        return tuple(
+            bytes(int(((i / 255) ** gamma) * 255 * scale + 0.5) for i in range(256))
+            for gamma, scale in zip(self.gamma, self.scale)
+        )
+
+
+class ColorProfiles:
+    LINEAR = None
+    GAMMA = ColorProfile(gamma=2.2)
+    # Common WS2812 5050 white point, green and blue run hot
+    WS2812 = ColorProfile(gamma=2.2, scale=(1.0, 0.69, 0.94))
+
+
 class AnimationModes:
     OFF = 0
     STATIC = 1
@@ -22,10 +106,15 @@ class AnimationModes:
     USER = 8
 
 
+class PowerTier:
+    ACTIVE = 0
+    SLOW = 1  # animating at idle_refresh_rate
+    DIM = 2  # last frame held at idle_brightness
+    OFF = 3
+
+
 class RGB(Extension):
     pos = 0
-    time = int(time.monotonic() * 10)
-    intervals = (30, 20, 10, 5)
 
     def __init__(
         self,
@@ -47,16 +136,24 @@ class RGB(Extension):
         reverse_animation=False,
         user_animation=None,
         disable_auto_write=False,
-        loopcounter=0,
+        refresh_rate=60,
+        frame_budget_ms=None,
+        effects=None,
+        color_profile=ColorProfiles.LINEAR,
+        idle_timeouts=None,
+        idle_refresh_rate=10,
+        idle_brightness=0.25,
     ):
+        # Showing is left to `show()`, which keeps track of the last frame.
         self.neopixel = neopixel.NeoPixel(
             pixel_pin,
             num_pixels,
             pixel_order=rgb_order,
-            auto_write=not disable_auto_write,
+            auto_write=False,
         )
 
         self.rgbw = bool(len(rgb_order) == 4)
+        self.set_color_profile(color_profile)
 
         self.num_pixels = num_pixels
         self.hue_step = hue_step
@@ -77,7 +174,51 @@ class RGB(Extension):
         self.reverse_animation = reverse_animation
         self.user_animation = user_animation
         self.disable_auto_write = disable_auto_write
-        self.loopcounter = loopcounter
+        self._curves = {}
+
+        # Layers from kmk.extensions.rgb_effects, composited in order on top
+        # of the animation before the frame is shown.
+        if effects is None:
+            effects = []
+        self.effects = effects
+
+        # Frame scheduling: animations advance refresh_rate times per second,
+        # independent of the main loop speed. A frame that takes longer than
+        # frame_budget_ms to render makes the next one be skipped.
+        self.refresh_rate = refresh_rate
+        self._frame_period = 1000 // refresh_rate
+        if frame_budget_ms is None:
+            frame_budget_ms = self._frame_period // 2
+        self.frame_budget_ms = frame_budget_ms
+        self._next_frame = ticks_ms()
+        self._in_frame = False
+        self._last_frame = bytearray(len(self.neopixel.buf))
+
+        # Statistics, updated about once per second: achieved frames per second
+        # and the share of the loop time spent animating, in percent.
+        self.frames_rendered = 0
+        self.frames_shown = 0
+        self.frames_skipped = 0
+        self.achieved_fps = 0
+        self.loop_share = 0
+        self._stats_start = self._next_frame
+        self._stats_frames = 0
+        self._stats_busy_ns = 0
+
+        # Idle policy: idle_timeouts are the milliseconds without matrix
+        # events after which to enter PowerTier.SLOW, DIM and OFF. The pixel
+        # buffer is kept as is through all tiers, waking up just shows it
+        # again. Frames rendered and milliseconds spent are counted per tier.
+        self.idle_timeouts = idle_timeouts
+        self.idle_refresh_rate = idle_refresh_rate
+        self.idle_brightness = idle_brightness
+        self.power_tier = PowerTier.ACTIVE
+        self.tier_frames = [0, 0, 0, 0]
+        self._tier_time_ms = [0, 0, 0, 0]
+        self._tier_since = self._next_frame
+        self._last_activity = self._next_frame
+        self._awake_brightness = self.neopixel.brightness
+        self._awake_period = self._frame_period
 
         make_key(
             names=('RGB_TOG',), on_press=self._rgb_tog, on_release=handler_passthrough
@@ -149,7 +290,8 @@ class RGB(Extension):
         return
 
     def during_bootup(self, sandbox):
-        return
+        for effect in self.effects:
+            effect.during_bootup(self)
 
     def before_matrix_scan(self, sandbox):
         return
@@ -161,69 +303,153 @@ class RGB(Extension):
         return
 
     def after_hid_send(self, sandbox):
+        if self.idle_timeouts is not None:
+            self._update_power_tier(sandbox)
+        for effect in self.effects:
+            if effect.enabled:
+                effect.update(self, sandbox)
         self.animate()
 
     def on_powersave_enable(self, sandbox):
-        return
+        if self.power_tier < PowerTier.DIM:
+            self._set_power_tier(PowerTier.DIM, ticks_ms())
 
     def on_powersave_disable(self, sandbox):
+        self.wake()
         self._do_update()
 
+    def wake(self):
+        '''
+        Returns to full frame rate and brightness, resetting the idle time.
+        '''
+        now = ticks_ms()
+        self._last_activity = now
+        if self.power_tier != PowerTier.ACTIVE:
+            self._set_power_tier(PowerTier.ACTIVE, now)
+
+    def _update_power_tier(self, sandbox):
+        if (
+            sandbox.matrix_update is not None
+            or sandbox.secondary_matrix_update is not None
+        ):
+            self.wake()
+            return
+
+        # Nothing left to step down to, and idle time would eventually
+        # overflow ticks_diff.
+        if self.power_tier == PowerTier.OFF:
+            return
+
+        now = ticks_ms()
+        idle = ticks_diff(now, self._last_activity)
+        tier = PowerTier.ACTIVE
+        for timeout in self.idle_timeouts:
+            if idle >= timeout:
+                tier += 1
+        if tier > self.power_tier:
+            self._set_power_tier(tier, now)
+
+    @property
+    def tier_time_ms(self):
+        '''
+        Milliseconds spent per PowerTier, the current one up to now.
+        '''
+        tier_time_ms = list(self._tier_time_ms)
+        tier_time_ms[self.power_tier] += ticks_diff(ticks_ms(), self._tier_since)
+        return tier_time_ms
+
+    def _set_power_tier(self, tier, now):
+        self._tier_time_ms[self.power_tier] += ticks_diff(now, self._tier_since)
+        self._tier_since = now
+        # Frames resume from now at the new rate, the time spent in the
+        # tier before doesn't count as frames skipped.
+        self._next_frame = now
+
+        if self.power_tier < PowerTier.DIM:
+            self._awake_brightness = self.neopixel.brightness
+        self.power_tier = tier
+
+        if tier == PowerTier.SLOW:
+            self._frame_period = 1000 // self.idle_refresh_rate
+        else:
+            self._frame_period = self._awake_period
+
+        if tier == PowerTier.DIM:
+            brightness = self._awake_brightness * self.idle_brightness
+        elif tier == PowerTier.OFF:
+            brightness = 0
+        else:
+            brightness = self._awake_brightness
+        if brightness != self.neopixel.brightness:
+            self.neopixel.brightness = brightness
+            # The buffer still holds the last frame, shown again at the new
+            # brightness.
+            self.show()
+
     @staticmethod
     def time_ms():
         return int(time.monotonic() * 1000)
 
-    def hsv_to_rgb(self, hue, sat, val):
+    def set_color_profile(self, profile):
         '''
-        Converts HSV values, and returns a tuple of RGB values
-        :param hue:
-        :param sat:
-        :param val:
-        :return: (r, g, b)
+        Calibrates the output with a ColorProfile, or None for raw values.
+        Applied while the output buffer is built, not per pixel write.
         '''
-        r = 0
-        g = 0
-        b = 0
+        self.color_profile = profile
+        if self.neopixel:
+            self.neopixel.set_calibration(None if profile is None else profile.tables())
 
-        if val > self.val_limit:
-            val = self.val_limit
+    @property
+    def val_limit(self):
+        return self._val_limit
 
-        if sat == 0:
-            r = val
-            g = val
-            b = val
+    @val_limit.setter
+    def val_limit(self, val_limit):
+        self._val_limit = val_limit
+        # Brightness limited value for every val that fits a byte
+        self._val_map = {val: min(val, val_limit) for val in range(256)}
 
+    def hsv_to_rgb(self, hue, sat, val):
+        '''
+        Converts HSV values, and returns a tuple of RGB values.
+        Integer hue, sat and val are converted in integers through lookup
+        tables, anything else in floats, with the same results.
+        :param hue: 0-359
+        :param sat: 0-100
+        :param val: 0-100, limited to val_limit
+        :return: (r, g, b)
+        '''
+        try:
+            ramp = _HUE_RAMP[hue]
+            sat = _SAT[sat]
+            val = self._val_map[val]
+        except KeyError:
+            if val > self._val_limit:
+                val = self._val_limit
+            return _float_hsv_to_rgb(hue, sat, val)
+
+        low = (100 - sat) * val // 100
+        # The ramping channel is val * (6000 - sat * ramp) / 6000. Where
+        # that is whole and the channel really ramps, the float conversion
+        # could land just below it and truncate one lower, work it out in
+        # floats as before so no color changes.
+        mid = val * (6000 - sat * ramp)
+        if mid % 6000 or not sat or ramp == 60 or not ramp:
+            mid //= 6000
         else:
-            base = ((100 - sat) * val) / 100
-            color = (val - base) * ((hue % 60) / 60)
-
-            x = int(hue / 60)
-            if x == 0:
-                r = val
-                g = base + color
-                b = base
-            elif x == 1:
-                r = val - color
-                g = val
-                b = base
-            elif x == 2:
-                r = base
-                g = val
-                b = base + color
-            elif x == 3:
-                r = base
-                g = val - color
-                b = val
-            elif x == 4:
-                r = base + color
-                g = base
-                b = val
-            elif x == 5:
-                r = val
-                g = base
-                b = val - color
-
-        return int(r), int(g), int(b)
+            mid = _float_ramp(hue, sat, val)
+
+        if hue < 180:
+            if hue < 60:
+                return val, mid, low
+            if hue < 120:
+                return mid, val, low
+            return low, val, mid
+        if hue < 240:
+            return low, mid, val
+        if hue < 300:
+            return mid, low, val
+        return val, low, mid
 
     def hsv_to_rgbw(self, hue, sat, val):
         '''
@@ -233,8 +459,8 @@ class RGB(Extension):
         :param val:
         :return: (r, g, b, w)
         '''
-        rgb = self.hsv_to_rgb(hue, sat, val)
-        return rgb[0], rgb[1], rgb[2], min(rgb)
+        r, g, b = self.hsv_to_rgb(hue, sat, val)
+        return r, g, b, min(r, g, b)
 
     def set_hsv(self, hue, sat, val, index):
         '''
@@ -272,7 +498,7 @@ class RGB(Extension):
         if self.neopixel and 0 <= index <= self.num_pixels - 1:
             self.neopixel[index] = rgb
             if not self.disable_auto_write:
-                self.neopixel.show()
+                self.show()
 
     def set_rgb_fill(self, rgb):
         '''
@@ -282,7 +508,7 @@ class RGB(Extension):
         if self.neopixel:
             self.neopixel.fill(rgb)
             if not self.disable_auto_write:
-                self.neopixel.show()
+                self.show()
 
     def increase_hue(self, step=None):
         '''
@@ -408,62 +634,100 @@ class RGB(Extension):
 
     def show(self):
         '''
-        Turns on all LEDs/Neopixels without changing stored values
+        Turns on all LEDs/Neopixels without changing stored values.
+        Deferred to the end of the frame while animating.
         '''
-        if self.neopixel:
+        if self.neopixel and not self._in_frame:
             self.neopixel.show()
+            self._last_frame[:] = self.neopixel.buf
 
     def animate(self):
         '''
-        Activates a "step" in the animation based on the active mode
-        :return: Returns the new state in animation
+        Activates a "step" in the animation based on the active mode, when the
+        next frame is due.
         '''
         if self.effect_init:
             self._init_effect()
 
-        if self.animation_mode is not AnimationModes.STATIC_STANDBY:
-            self.loopcounter += 1
-            if self.loopcounter >= 7 and self.enable:
-                self.loopcounter = 0
-                if self.animation_mode == AnimationModes.BREATHING:
-                    self.effect_breathing()
-                elif self.animation_mode == AnimationModes.RAINBOW:
-                    self.effect_rainbow()
-                elif self.animation_mode == AnimationModes.BREATHING_RAINBOW:
-                    self.effect_breathing_rainbow()
-                elif self.animation_mode == AnimationModes.STATIC:
-                    self.effect_static()
-                elif self.animation_mode == AnimationModes.KNIGHT:
-                    self.effect_knight()
-                elif self.animation_mode == AnimationModes.SWIRL:
-                    self.effect_swirl()
-                elif self.animation_mode == AnimationModes.USER:
-                    self.user_animation(self)
-                elif self.animation_mode == AnimationModes.STATIC_STANDBY:
-                    pass
-                else:
-                    self.off()
-                if self.loopcounter >= 7:
-                    self.loopcounter = 0
-
-    def _animation_step(self):
-        interval = self.time_ms() - self.time
-        if interval >= max(self.intervals):
-            self.time = self.time_ms()
-            return max(self.intervals)
-        if interval in self.intervals:
-            return interval
-        return None
-
-    def _init_effect(self):
-        if (
-            self.animation_mode == AnimationModes.BREATHING
-            or self.animation_mode == AnimationModes.BREATHING_RAINBOW
-        ):
-            self.intervals = (30, 20, 10, 5)
+        if not self.enable or self.power_tier >= PowerTier.DIM:
+            return
+        # A static color needs no frames, unless there are effects on top.
+        if self.animation_mode is AnimationModes.STATIC_STANDBY and not self.effects:
+            return
+
+        now = ticks_ms()
+        late = ticks_diff(now, self._next_frame)
+        if late < 0:
+            return
+
+        # Under load, drop the frames we're late for instead of rendering them
+        # back to back.
+        if late >= self._frame_period:
+            self.frames_skipped += late // self._frame_period
+            self._next_frame = now
+        self._next_frame = ticks_add(self._next_frame, self._frame_period)
+
+        start = time.monotonic_ns()
+        self._in_frame = True
+        try:
+            self._render_frame()
+            # The animation rendered into the pixel buffer, which serves as
+            # the base layer of the frame.
+            for effect in self.effects:
+                if effect.enabled:
+                    effect.draw(self, self.neopixel.buf)
+        finally:
+            self._in_frame = False
+        self._show_frame()
+        busy_ns = time.monotonic_ns() - start
+
+        if busy_ns > self.frame_budget_ms * 1000000:
+            self.frames_skipped += 1
+            self._next_frame = ticks_add(self._next_frame, self._frame_period)
+
+        self._update_stats(now, busy_ns)
+
+    def _render_frame(self):
+        if self.animation_mode == AnimationModes.BREATHING:
+            self.effect_breathing()
+        elif self.animation_mode == AnimationModes.RAINBOW:
+            self.effect_rainbow()
+        elif self.animation_mode == AnimationModes.BREATHING_RAINBOW:
+            self.effect_breathing_rainbow()
+        elif self.animation_mode == AnimationModes.STATIC:
+            self.effect_static()
+        elif self.animation_mode == AnimationModes.STATIC_STANDBY:
+            self.set_hsv_fill(self.hue, self.sat, self.val)
+        elif self.animation_mode == AnimationModes.KNIGHT:
+            self.effect_knight()
         elif self.animation_mode == AnimationModes.SWIRL:
-            self.intervals = (50, 50)
+            self.effect_swirl()
+        elif self.animation_mode == AnimationModes.USER:
+            self.user_animation(self)
+        else:
+            self.off()
+
+    def _show_frame(self):
+        self.frames_rendered += 1
+        self.tier_frames[self.power_tier] += 1
+        # Frames identical to what the LEDs already show don't need pushing.
+        if self.neopixel.buf != self._last_frame:
+            self.frames_shown += 1
+            self.show()
+
+    def _update_stats(self, now, busy_ns):
+        self._stats_frames += 1
+        self._stats_busy_ns += busy_ns
+        window = ticks_diff(now, self._stats_start)
+        if window >= 1000:
+            self.achieved_fps = self._stats_frames * 1000 // window
+            # busy_ns / (window * 1e6) in percent
+            self.loop_share = self._stats_busy_ns // (window * 10000)
+            self._stats_start = now
+            self._stats_frames = 0
+            self._stats_busy_ns = 0
 
+    def _init_effect(self):
         self.pos = 0
         self.reverse_animation = False
         self.effect_init = False
@@ -479,14 +743,47 @@ class RGB(Extension):
         self.set_hsv_fill(self.hue, self.sat, self.val)
         self.animation_mode = AnimationModes.STATIC_STANDBY
 
-    def effect_breathing(self):
+    def curve(self, name, params, level):
+        '''
+        Returns a 256 entry bytearray holding level(pos, *params) for every
+        pos in 0-255, clamped to a byte. The table is kept under name and only
+        recomputed when params change, so effects (including user animations)
+        index it per frame instead of doing the math every frame.
+        :param name: cache key
+        :param params: tuple of the arguments the curve depends on
+        :param level: function(pos, *params) returning a number
+        :return: bytearray(256)
+        '''
+        cached = self._curves.get(name)
+        if cached is not None:
+            if cached[0] == params:
+                return cached[1]
+            table = cached[1]
+        else:
+            table = bytearray(256)
+
+        for pos in range(256):
+            table[pos] = min(max(int(level(pos, *params)), 0), 255)
+        self._curves[name] = (params, table)
+        return table
+
+    @staticmethod
+    def _breathing_level(pos, breathe_center, val_limit):
         # http://sean.voisen.org/blog/2011/10/breathing-led-with-arduino/
         # https://github.com/qmk/qmk_firmware/blob/9f1d781fcb7129a07e671a46461e501e3f1ae59d/quantum/rgblight.c#L806
-        sined = sin((self.pos / 255.0) * pi)
-        multip_1 = exp(sined) - self.breathe_center / e
-        multip_2 = self.val_limit / (e - 1 / e)
+        sined = sin((pos / 255.0) * pi)
+        multip_1 = exp(sined) - breathe_center / e
+        multip_2 = val_limit / (e - 1 / e)
+        return multip_1 * multip_2
 
-        self.val = int(multip_1 * multip_2)
+    def effect_breathing(self):
+        breathing = self.curve(
+            'breathing',
+            (self.breathe_center, self.val_limit),
+            self._breathing_level,
+        )
+
+        self.val = breathing[int(self.pos) % 256]
         self.pos = (self.pos + self.animation_speed) % 256
         self.set_hsv_fill(self.hue, self.sat, self.val)
 
@@ -500,19 +797,13 @@ class RGB(Extension):
 
     def effect_swirl(self):
         self.increase_hue(self.animation_speed)
-        self.disable_auto_write = True  # Turn off instantly showing
         for i in range(0, self.num_pixels):
             self.set_hsv(
                 (self.hue - (i * self.num_pixels)) % 360, self.sat, self.val, i
             )
 
-        # Show final results
-        self.disable_auto_write = False  # Resume showing changes
-        self.show()
-
     def effect_knight(self):
         # Determine which LEDs should be lit up
-        self.disable_auto_write = True  # Turn off instantly showing
         self.off()  # Fill all off
         pos = int(self.pos)
 
@@ -529,10 +820,6 @@ class RGB(Extension):
         else:
             self.pos += self.animation_speed / 2
 
-        # Show final results
-        self.disable_auto_write = False  # Resume showing changes
-        self.show()
-
     def _rgb_tog(self, *args, **kwargs):
         if self.animation_mode == AnimationModes.STATIC:
             self.animation_mode = AnimationModes.STATIC_STANDBY
@@ -0,0 +1,369 @@
+import usb_hid
+
+import time
+
+from kmk.hid import HIDUsage
+
+
+class Blend:
+    OVER = 0  # lit pixels of the layer replace what's below
+    ADD = 1  # per channel sum, saturating at 255
+    MAX = 2  # per channel maximum
+    MULTIPLY = 3  # scales what's below, black in the layer masks it out
+    REPLACE = 4  # the layer replaces everything below
+
+
+def blend_into(dst, src, mode, bpp=3):
+    '''
+    Composites the framebuffer src onto dst in place. Both are bytearrays of
+    the same length in pixel order.
+    :param dst: bytearray
+    :param src: bytearray
+    :param mode: Blend mode
+    :param bpp: bytes per pixel, only used by Blend.OVER
+    '''
+    if mode == Blend.REPLACE:
+        dst[:] = src
+    elif mode == Blend.OVER:
+        for offset in range(0, len(src), bpp):
+            if src[offset] or src[offset + 1] or src[offset + 2]:
+                for i in range(offset, offset + bpp):
+                    dst[i] = src[i]
+            elif bpp == 4 and src[offset + 3]:
+                dst[offset + 3] = src[offset + 3]
+    elif mode == Blend.ADD:
+        for i in range(len(src)):
+            if src[i]:
+                dst[i] = min(dst[i] + src[i], 255)
+    elif mode == Blend.MAX:
+        for i in range(len(src)):
+            if src[i] > dst[i]:
+                dst[i] = src[i]
+    elif mode == Blend.MULTIPLY:
+        for i in range(len(src)):
+            dst[i] = dst[i] * src[i] // 255
+
+
+class Framebuffer:
+    '''
+    Off-screen pixel buffer laid out like the NeoPixel buffer it is
+    composited onto, so blending is plain byte math.
+    '''
+
+    def __init__(self, num_pixels, order=(1, 0, 2)):
+        self.num_pixels = num_pixels
+        self.order = order
+        self.bpp = len(order)
+        self.buf = bytearray(num_pixels * self.bpp)
+
+    def set_rgb(self, index, r, g, b, w=0):
+        if 0 <= index < self.num_pixels:
+            offset = index * self.bpp
+            buf = self.buf
+            order = self.order
+            buf[offset + order[0]] = r
+            buf[offset + order[1]] = g
+            buf[offset + order[2]] = b
+            if self.bpp == 4:
+                buf[offset + order[3]] = w
+
+    def fill(self, r, g, b, w=0):
+        for index in range(self.num_pixels):
+            self.set_rgb(index, r, g, b, w)
+
+    def clear(self):
+        buf = self.buf
+        for i in range(len(buf)):
+            buf[i] = 0
+
+
+class Effect:
+    '''
+    A layer the RGB extension composites on top of its base animation, in
+    list order. Subclasses implement render(), which draws into
+    self.framebuffer, and may implement update(), which sees every loop's
+    sandbox. Clear `visible` while there's nothing to draw to skip blending.
+
+    A render that takes longer than budget_ms makes the effect hold its last
+    framebuffer for as many frames as it overran by, so one slow effect
+    can't stall the others.
+    '''
+
+    blend = Blend.OVER
+    budget_ms = 2
+
+    def __init__(self, blend=None, budget_ms=None, enabled=True):
+        if blend is not None:
+            self.blend = blend
+        if budget_ms is not None:
+            self.budget_ms = budget_ms
+        self.enabled = enabled
+        self.visible = True
+        self.framebuffer = None
+
+        # Instrumentation: duration of the last render and overrun count
+        self.cost_us = 0
+        self.overruns = 0
+        self._hold = 0
+
+    def during_bootup(self, rgb):
+        self.framebuffer = Framebuffer(rgb.num_pixels, rgb.neopixel.order)
+
+    def update(self, rgb, sandbox):
+        return
+
+    def render(self, rgb):
+        raise NotImplementedError
+
+    def draw(self, rgb, out):
+        '''
+        Renders the effect unless it is holding after an overrun, then
+        blends it onto out.
+        '''
+        if self._hold:
+            self._hold -= 1
+        else:
+            start = time.monotonic_ns()
+            self.render(rgb)
+            self.cost_us = (time.monotonic_ns() - start) // 1000
+            budget_us = self.budget_ms * 1000
+            if self.cost_us > budget_us:
+                self.overruns += 1
+                self._hold = self.cost_us // budget_us
+
+        if self.visible:
+            blend_into(out, self.framebuffer.buf, self.blend, self.framebuffer.bpp)
+
+
+class LayerIndicator(Effect):
+    '''
+    Colors pixels by the highest active layer.
+    :param colors: dict of layer to (r, g, b), layers without are not shown
+    :param pixels: indices to color, all pixels when None
+    '''
+
+    def __init__(self, colors, pixels=None, **kwargs):
+        super().__init__(**kwargs)
+        self.colors = colors
+        self.pixels = pixels
+        self.layer = None
+        self._drawn = None
+
+    def update(self, rgb, sandbox):
+        if sandbox.active_layers:
+            self.layer = sandbox.active_layers[0]
+
+    def render(self, rgb):
+        if self.layer == self._drawn:
+            return
+        self._drawn = self.layer
+
+        color = self.colors.get(self.layer)
+        self.visible = color is not None
+        if color is None:
+            return
+
+        fb = self.framebuffer
+        if self.pixels is None:
+            fb.fill(*color)
+        else:
+            fb.clear()
+            for index in self.pixels:
+                fb.set_rgb(index, *color)
+
+
+class LockIndicator(Effect):
+    '''
+    Lights pixels while a host lock LED (caps lock by default) is on.
+    :param color: (r, g, b)
+    :param pixels: indices to light
+    :param lock_code: bit of the HID LED report, see LockCode in lock_status
+    '''
+
+    def __init__(self, color=(255, 255, 255), pixels=(0,), lock_code=0x02, **kwargs):
+        super().__init__(**kwargs)
+        self.color = color
+        self.pixels = pixels
+        self.lock_code = lock_code
+        self.report = 0
+        self.visible = False
+        self._hid = None
+        self._drawn = None
+        for device in usb_hid.devices:
+            if device.usage == HIDUsage.KEYBOARD:
+                self._hid = device
+
+    def update(self, rgb, sandbox):
+        if self._hid:
+            report = self._hid.get_last_received_report()
+            if report:
+                self.report = report[0]
+
+    def render(self, rgb):
+        locked = bool(self.report & self.lock_code)
+        if locked == self._drawn:
+            return
+        self._drawn = locked
+
+        self.visible = locked
+        fb = self.framebuffer
+        fb.clear()
+        for index in self.pixels:
+            fb.set_rgb(index, *self.color)
+
+
+class ReactiveEffect(Effect):
+    '''
+    Base for effects lighting up in response to key presses. Every LED has an
+    intensity that decays by `decay` per frame. Only LEDs with a non-zero
+    intensity are kept in a list and touched by render(), so a frame costs
+    O(active LEDs) regardless of how fast keys are pressed.
+    :param led_map: dict of int coordinate (row << 8 | col, see
+      kmk.matrix.intify_coordinate) to LED index
+    :param color: (r, g, b) at full intensity
+    :param decay: intensity lost per frame, out of 255
+    '''
+
+    blend = Blend.ADD
+
+    def __init__(self, led_map, color=(255, 255, 255), decay=16, **kwargs):
+        super().__init__(**kwargs)
+        self.led_map = led_map
+        self.color = color
+        self.decay = decay
+        self.visible = False
+        self.intensity = None
+        self.active = []
+
+    def during_bootup(self, rgb):
+        super().during_bootup(rgb)
+        self.intensity = bytearray(rgb.num_pixels)
+
+    def update(self, rgb, sandbox):
+        update = sandbox.matrix_update
+        if update is not None and update[2]:
+            led = self.led_map.get(update[0] << 8 | update[1])
+            if led is not None:
+                self.on_key(led)
+
+    def on_key(self, led):
+        self.light(led, 255)
+
+    def light(self, led, level):
+        '''Raises the intensity of an LED to level and marks it active.'''
+        if not self.intensity[led]:
+            self.active.append(led)
+        if level > self.intensity[led]:
+            self.intensity[led] = level
+
+    def shade(self, level):
+        '''Returns the color to draw at intensity level.'''
+        r, g, b = self.color
+        return r * level // 255, g * level // 255, b * level // 255
+
+    def render(self, rgb):
+        intensity = self.intensity
+        fb = self.framebuffer
+        active = self.active
+        decay = self.decay
+        i = 0
+        while i < len(active):
+            led = active[i]
+            level = intensity[led]
+            level = level - decay if level > decay else 0
+            intensity[led] = level
+            fb.set_rgb(led, *self.shade(level))
+            if level:
+                i += 1
+            else:
+                # Faded out and drawn black, order doesn't matter
+                active[i] = active[-1]
+                active.pop()
+        self.visible = bool(active)
+
+
+class KeyFlash(ReactiveEffect):
+    '''
+    Flashes the LED of a pressed key, fading it out over 255 / decay frames.
+    '''
+
+
+class Heatmap(ReactiveEffect):
+    '''
+    Heats up the LED of every pressed key by `heat`, cooling down slowly.
+    Colors go from blue while cool to red when hot.
+    '''
+
+    def __init__(self, led_map, heat=48, decay=1, **kwargs):
+        super().__init__(led_map, decay=decay, **kwargs)
+        self.heat = heat
+
+    def on_key(self, led):
+        self.light(led, min(self.intensity[led] + self.heat, 255))
+
+    def shade(self, level):
+        return level, 0, (255 - level) * level // 255
+
+
+class Ripple(ReactiveEffect):
+    '''
+    Sends a ring of light outwards from the LED of a pressed key.
+    :param positions: (x, y) of every LED, the strip index along x by default
+    :param speed: distance the ring travels per frame
+    :param max_ripples: concurrent rings, the oldest is dropped for a new
+      one so fast typing can't add work
+    '''
+
+    def __init__(self, led_map, positions=None, speed=1, max_ripples=4, **kwargs):
+        super().__init__(led_map, **kwargs)
+        self.positions = positions
+        self.speed = speed
+        self.max_ripples = max_ripples
+        # Per ripple origin, radius and how far into the origin's distance
+        # ordered LED list the ring has spread.
+        self._origin = [0] * max_ripples
+        self._radius = [0] * max_ripples
+        self._reached = [-1] * max_ripples
+        self._next = 0
+        self._rings = {}
+
+    def during_bootup(self, rgb):
+        super().during_bootup(rgb)
+        positions = self.positions
+        if positions is None:
+            positions = [(i, 0) for i in range(rgb.num_pixels)]
+
+        # For every LED a key maps to: all LEDs ordered by distance and their
+        # squared distances, so spreading a ring only walks forward.
+        for origin in set(self.led_map.values()):
+            ox, oy = positions[origin]
+            dist = [
+                (x - ox) * (x - ox) + (y - oy) * (y - oy) for x, y in positions
+            ]
+            order = sorted(range(len(positions)), key=lambda led: dist[led])
+            self._rings[origin] = (
+                tuple(order),
+                tuple(dist[led] for led in order),
+            )
+
+    def on_key(self, led):
+        slot = self._next
+        self._next = (slot + 1) % self.max_ripples
+        self._origin[slot] = led
+        self._radius[slot] = 0
+        self._reached[slot] = 0
+
+    def render(self, rgb):
+        for slot in range(self.max_ripples):
+            reached = self._reached[slot]
+            if reached < 0:
+                continue
+            order, dist = self._rings[self._origin[slot]]
+            radius = self._radius[slot]
+            limit = radius * radius
+            while reached < len(order) and dist[reached] <= limit:
+                self.light(order[reached], 255)
+                reached += 1
+            self._radius[slot] = radius + self.speed
+            self._reached[slot] = reached if reached < len(order) else -1
+        super().render(rgb)
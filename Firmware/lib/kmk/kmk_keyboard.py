@@ -373,6 +373,11 @@ class KMKKeyboard:
                     print('Failed to run post hid function in extension: ', err, ext)
 
     def go(self, hid_type=HIDModes.USB, secondary_hid_type=None, **kwargs):
+        self._init(hid_type=hid_type, secondary_hid_type=secondary_hid_type, **kwargs)
+        while True:
+            self._main_loop()
+
+    def _init(self, hid_type=HIDModes.USB, secondary_hid_type=None, **kwargs):
         self._go_args = kwargs
         self.hid_type = hid_type
         self.secondary_hid_type = secondary_hid_type
@@ -398,46 +403,46 @@ class KMKKeyboard:
 
         self._print_debug_cycle(init=True)
 
-        while True:
-            self.current_key = None
-            self.state_changed = False
-            self.sandbox.active_layers = self.active_layers.copy()
+    def _main_loop(self):
+        self.current_key = None
+        self.state_changed = False
+        self.sandbox.active_layers = self.active_layers.copy()
 
-            self.before_matrix_scan()
+        self.before_matrix_scan()
 
-            self.matrix_update = (
-                self.sandbox.matrix_update
-            ) = self.matrix.scan_for_changes()
-            self.sandbox.secondary_matrix_update = self.secondary_matrix_update
+        self.matrix_update = (
+            self.sandbox.matrix_update
+        ) = self.matrix.scan_for_changes()
+        self.sandbox.secondary_matrix_update = self.secondary_matrix_update
 
-            self.after_matrix_scan()
+        self.after_matrix_scan()
 
-            self._handle_matrix_report(self.secondary_matrix_update)
-            self.secondary_matrix_update = None
-            self._handle_matrix_report(self.matrix_update)
-            self.matrix_update = None
+        self._handle_matrix_report(self.secondary_matrix_update)
+        self.secondary_matrix_update = None
+        self._handle_matrix_report(self.matrix_update)
+        self.matrix_update = None
 
-            self.before_hid_send()
+        self.before_hid_send()
 
-            if self.hid_pending:
-                self._send_hid()
+        if self.hid_pending:
+            self._send_hid()
 
-            self._old_timeouts_len = len(self._timeouts)
-            self._process_timeouts()
-            self._new_timeouts_len = len(self._timeouts)
+        self._old_timeouts_len = len(self._timeouts)
+        self._process_timeouts()
+        self._new_timeouts_len = len(self._timeouts)
 
-            if self._old_timeouts_len != self._new_timeouts_len:
-                self.state_changed = True
-                if self.hid_pending:
-                    self._send_hid()
+        if self._old_timeouts_len != self._new_timeouts_len:
+            self.state_changed = True
+            if self.hid_pending:
+                self._send_hid()
 
-            self.after_hid_send()
+        self.after_hid_send()
 
-            if self._trigger_powersave_enable:
-                self.powersave_enable()
+        if self._trigger_powersave_enable:
+            self.powersave_enable()
 
-            if self._trigger_powersave_disable:
-                self.powersave_disable()
+        if self._trigger_powersave_disable:
+            self.powersave_disable()
 
-            if self.state_changed:
-                self._print_debug_cycle()
+        if self.state_changed:
+            self._print_debug_cycle()
@@ -1,91 +1,168 @@
 # See docs/encoder.md for how to use
 
 import digitalio
+from micropython import const
 from supervisor import ticks_ms
 
+from kmk.kmktime import ticks_diff
 from kmk.modules import Module
 
-# NB : not using rotaryio as it requires the pins to be consecutive
+try:
+    import rotaryio
+except ImportError:
+    rotaryio = None
+
+# NB : rotaryio requires the pins to be consecutive on some ports (RP2040),
+# GPIO polling is used as a fallback where it can't be used.
+
+_ILLEGAL = const(2)
+
+# Quadrature transitions, indexed by (old_state << 2) | new_state where a state
+# is (pin_a << 1) | pin_b. +1 follows 0 -> 2 -> 3 -> 1 -> 0, -1 the reverse.
+# Both pins changing at once means an edge was missed and is flagged illegal.
+# fmt: off
+_TRANSITIONS = (
+    0, -1, 1, _ILLEGAL,
+    1, 0, _ILLEGAL, -1,
+    -1, _ILLEGAL, 0, 1,
+    _ILLEGAL, 1, -1, 0,
+)
+# fmt: on
+
+
+class EncoderState:
+    '''
+    Encoder state handed to the callbacks. Each encoder reuses a single
+    instance that is updated in place, copy the values if you need them after
+    the callback returned. Item access (`state['direction']`) is kept for
+    callbacks written against the former dict.
+    '''
+
+    def __init__(self):
+        self.encoder_id = None
+        self.direction = 0
+        self.position = 0
+        self.delta = 0
+        self.is_pressed = False
+        self.velocity = 0
+
+    def __getitem__(self, name):
+        return getattr(self, name)
 
 
 class Encoder:
 
     VELOCITY_MODE = True
 
-    def __init__(self, pin_a, pin_b, pin_button=None, is_inverted=False):
-        self.pin_a = EncoderPin(pin_a)
-        self.pin_b = EncoderPin(pin_b)
+    def __init__(self, pin_a, pin_b, pin_button=None, is_inverted=False, divisor=4):
+        # Divisor is the number of edges per detent: 4 for most encoders, which
+        # rest with both pins high, 2 for encoders that also rest on both low.
+        self.divisor = divisor
+        self._half_divisor = divisor // 2
+
+        # Claim the rotation pins first, so a failing backend doesn't leave the
+        # button pin claimed.
+        self._init_rotation(pin_a, pin_b)
+
         self.pin_button = EncoderPin(pin_button, button_type=True) if pin_button is not None else None
         self.is_inverted = is_inverted
 
-        self._state = (self.pin_a.get_value(), self.pin_b.get_value())
-        self._direction = None
+        self._direction = 0
         self._pos = 0
+        # detents since the last on_move_do call
+        self._delta = 0
         self._button_state = True
         self._velocity = 0
 
         self._movement = 0
+        self._illegal_transitions = 0
         self._timestamp = ticks_ms()
 
+        self.encoder_state = EncoderState()
+
         # callback functions on events. Need to be defined externally
         self.on_move_do = None
         self.on_button_do = None
 
     def get_state(self):
-        return {
-            'direction': self.is_inverted and -self._direction or self._direction,
-            'position': self.is_inverted and -self._pos or self._pos,
-            'is_pressed': not self._button_state,
-            'velocity': self._velocity,
-        }
+        state = self.encoder_state
+        if self.is_inverted:
+            state.direction = -self._direction
+            state.position = -self._pos
+            state.delta = -self._delta
+        else:
+            state.direction = self._direction
+            state.position = self._pos
+            state.delta = self._delta
+        state.is_pressed = not self._button_state
+        state.velocity = self._velocity
+        return state
+
+    def _init_rotation(self, pin_a, pin_b):
+        self.pin_a = EncoderPin(pin_a)
+        self.pin_b = EncoderPin(pin_b)
+        self._state = self.pin_a.get_value() << 1 | self.pin_b.get_value()
 
     # Called in a loop to refresh encoder state
     def update_state(self):
         # Rotation events
-        new_state = (self.pin_a.get_value(), self.pin_b.get_value())
+        self._rotation_event()
+
+        # Report all detents of this poll at once
+        if self._delta:
+            # Velocity
+            if self.VELOCITY_MODE:
+                new_timestamp = ticks_ms()
+                self._velocity = ticks_diff(new_timestamp, self._timestamp) // abs(
+                    self._delta
+                )
+                self._timestamp = new_timestamp
+
+            if self.on_move_do is not None:
+                self.on_move_do(self.get_state())
+            self._delta = 0
+
+        # Button events
+        if self.pin_button:
+            new_button_state = self.pin_button.get_value()
+            if new_button_state != self._button_state:
+                self._button_state = new_button_state
+                if self.on_button_do is not None:
+                    self.on_button_do(self.get_state())
+
+    def _rotation_event(self):
+        new_state = self.pin_a.get_value() << 1 | self.pin_b.get_value()
 
         if new_state != self._state:
             # it moves !
-            self._movement += 1
-            # false / false and true / true are common half steps
-            # looking on the step just before helps determining
-            # the direction
-            if new_state[0] == new_state[1] and self._state[0] != self._state[1]:
-                if new_state[1] == self._state[0]:
+            delta = _TRANSITIONS[self._state << 2 | new_state]
+            if delta == _ILLEGAL:
+                # an edge was missed, we can't tell the direction. Settling
+                # on the detent below resynchronizes the count.
+                self._illegal_transitions += 1
+            else:
+                self._movement += delta
+                self._direction = delta
+
+            # when the encoder settles on a detent: both pins high, or both
+            # pins low for 2 edges per detent encoders.
+            if new_state == 3 or (new_state == 0 and self.divisor == 2):
+                # count a detent once at least half of its edges went the same
+                # way, which tolerates a missed edge on fast spins.
+                if self._movement >= self._half_divisor:
                     self._direction = 1
-                else:
+                    self._on_detent()
+                elif self._movement <= -self._half_divisor:
                     self._direction = -1
-
-            # when the encoder settles on a position (every 2 steps)
-            if new_state == (True, True):
-                if self._movement > 2:
-                    # 1 full step is 4 movements, however, when rotated quickly,
-                    # some steps may be missed. This makes it behaves more
-                    # naturally
-                    real_movement = round(self._movement / 4)
-                    self._pos += self._direction * real_movement
-                    if self.on_move_do is not None:
-                        for i in range(real_movement):
-                            self.on_move_do(self.get_state())
+                    self._on_detent()
                 # Reinit to properly identify new movement
                 self._movement = 0
-                self._direction = 0
 
             self._state = new_state
 
-        # Velocity
-        if self.VELOCITY_MODE:
-            new_timestamp = ticks_ms()
-            self._velocity = new_timestamp - self._timestamp
-            self._timestamp = new_timestamp
-
-        # Button events
-        if self.pin_button:
-            new_button_state = self.pin_button.get_value()
-            if new_button_state != self._button_state:
-                self._button_state = new_button_state
-                if self.on_button_do is not None:
-                    self.on_button_do(self.get_state())
+    def _on_detent(self):
+        self._pos += self._direction
+        self._delta += self._direction
 
     # returnd knob velocity as milliseconds between position changes (detents)
     # for backwards compatibility
@@ -94,6 +171,27 @@ class Encoder:
         return self._velocity
 
 
+class RotaryioEncoder(Encoder):
+    '''
+    Encoder counted in hardware by `rotaryio`, edges keep being counted while
+    the main loop is busy and only the accumulated delta is read on update.
+    '''
+
+    def _init_rotation(self, pin_a, pin_b):
+        self.encoder = rotaryio.IncrementalEncoder(pin_a, pin_b, self.divisor)
+        self._state = self.encoder.position
+
+    def _rotation_event(self):
+        position = self.encoder.position
+        delta = position - self._state
+
+        if delta:
+            self._state = position
+            self._direction = 1 if delta > 0 else -1
+            self._pos += delta
+            self._delta += delta
+
+
 class EncoderPin:
     def __init__(self, pin, button_type=False):
         self.pin = pin
@@ -115,8 +213,18 @@ class EncoderPin:
 class EncoderHandler(Module):
     def __init__(self):
         self.encoders = []
+        self._keyboard = None
         self.pins = None
         self.map = None
+        self.divisor = 4
+        # Prefer hardware counting where the pins allow it
+        self.use_rotaryio = True
+        # Velocity based acceleration: a sequence of (ms_per_detent, factor)
+        # pairs, sorted by ascending ms_per_detent. Detents turned faster than
+        # ms_per_detent are multiplied by factor, e.g. ((15, 8), (40, 4), (80, 2))
+        self.acceleration = None
+        # Taps still to send, as [key, count] in the order they were turned
+        self._taps = []
 
     def on_runtime_enable(self, keyboard):
         return
@@ -125,29 +233,84 @@ class EncoderHandler(Module):
         return
 
     def during_bootup(self, keyboard):
+        self._keyboard = keyboard
         if self.pins and self.map:
             for idx, pins in enumerate(self.pins):
                 gpio_pins = pins[:3]
-                new_encoder = Encoder(*gpio_pins)
-                # In our case, we need to define keybord and encoder_id for callbacks
-                new_encoder.on_move_do = lambda x, bound_idx = idx: self.on_move_do(keyboard, bound_idx, x)
-                new_encoder.on_button_do = lambda x, bound_idx = idx: self.on_button_do(keyboard, bound_idx, x)
+                new_encoder = None
+                if self.use_rotaryio and rotaryio is not None:
+                    try:
+                        new_encoder = RotaryioEncoder(*gpio_pins, divisor=self.divisor)
+                    except (ValueError, RuntimeError) as e:
+                        if keyboard.debug_enabled:
+                            print('Encoder falls back to GPIO polling: ', e)
+                if new_encoder is None:
+                    new_encoder = Encoder(*gpio_pins, divisor=self.divisor)
+                # The encoder_id travels with the state, no need to bind it
+                new_encoder.encoder_state.encoder_id = idx
+                new_encoder.on_move_do = self._on_move
+                new_encoder.on_button_do = self._on_button
                 self.encoders.append(new_encoder)
         return
 
+    def _on_move(self, state):
+        self.on_move_do(self._keyboard, state.encoder_id, state)
+
+    def _on_button(self, state):
+        self.on_button_do(self._keyboard, state.encoder_id, state)
+
     def on_move_do(self, keyboard, encoder_id, state):
         if self.map:
             layer_id = keyboard.active_layers[0]
+            steps = self.accelerate(state.delta, state.velocity)
             # if Left, key index 0 else key index 1
-            if state['direction'] == -1:
+            if steps < 0:
                 key_index = 0
             else:
                 key_index = 1
             key = self.map[layer_id][encoder_id][key_index]
-            keyboard.tap_key(key)
+
+            # Keys can take all pending detents at once, i.e. a single MIDI CC
+            # with the accumulated delta. Everything else is tapped once per
+            # detent.
+            on_encoder_move = getattr(key.meta, 'on_encoder_move', None)
+            if on_encoder_move is not None:
+                on_encoder_move(key, keyboard, steps)
+            else:
+                self.tap_repeat(keyboard, key, abs(steps))
+
+    def accelerate(self, steps, velocity):
+        if self.acceleration:
+            for ms_per_detent, factor in self.acceleration:
+                if velocity < ms_per_detent:
+                    return steps * factor
+        return steps
+
+    def tap_repeat(self, keyboard, key, count):
+        '''
+        Tap a key count times, one tap per main loop iteration. Taps of the
+        same key in one iteration would be a single press, so the ones that
+        don't fit are queued and sent by the following iterations.
+        '''
+        if not count:
+            return
+        taps = self._taps
+        if taps and taps[-1][0] is key:
+            taps[-1][1] += count
+        else:
+            taps.append([key, count])
+
+    def _send_tap(self, keyboard):
+        # The main loop sends the press, and the release once tap_key's
+        # timeout has run in the same iteration.
+        tap = self._taps[0]
+        keyboard.tap_key(tap[0])
+        tap[1] -= 1
+        if not tap[1]:
+            self._taps.pop(0)
 
     def on_button_do(self, keyboard, encoder_id, state):
-        if state['is_pressed'] is True:
+        if state.is_pressed is True:
             layer_id = keyboard.active_layers[0]
             key = self.map[layer_id][encoder_id][2]
             keyboard.tap_key(key)
@@ -159,6 +322,9 @@ class EncoderHandler(Module):
         for encoder in self.encoders:
             encoder.update_state()
 
+        if self._taps:
+            self._send_tap(keyboard)
+
         return keyboard
 
     def after_matrix_scan(self, keyboard):
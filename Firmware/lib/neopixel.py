@@ -45,6 +45,8 @@ RGBW = (0, 1, 2, 3)
 GRBW = (1, 0, 2, 3)
 """Green Red Blue White"""
 
+_IDENTITY = bytes(range(256))
+
 class NeoPixel:
     """
     A sequence of neopixels.
@@ -86,6 +88,13 @@ class NeoPixel:
             self.order = pixel_order
             self.bpp = len(self.order)
         self.buf = bytearray(self.n * self.bpp)
+        # Brightness scaled and calibrated copy of buf that is actually
+        # written out, and the contents of buf it was last built from. Only
+        # allocated once brightness drops below full or calibration is set.
+        self._out = None
+        self._out_src = None
+        self._luts = None
+        self._calibration = None
         # Set auto_write to False temporarily so brightness setter does _not_
         # call show() while in __init__.
         self.auto_write = False
@@ -113,7 +122,10 @@ class NeoPixel:
             index += len(self)
         if index >= self.n or index < 0:
             raise IndexError
-        offset = index * self.bpp
+        self._encode(value, self.buf, index * self.bpp)
+
+    def _encode(self, value, buf, offset):
+        """Writes color ``value`` into ``buf`` at ``offset`` in pixel order."""
         r = 0
         g = 0
         b = 0
@@ -137,11 +149,11 @@ class NeoPixel:
         else:
             raise ValueError("Color tuple size does not match pixel_order.")
 
-        self.buf[offset + self.order[0]] = r
-        self.buf[offset + self.order[1]] = g
-        self.buf[offset + self.order[2]] = b
+        buf[offset + self.order[0]] = r
+        buf[offset + self.order[1]] = g
+        buf[offset + self.order[2]] = b
         if self.bpp == 4:
-            self.buf[offset + self.order[3]] = w
+            buf[offset + self.order[3]] = w
 
     def __setitem__(self, index, val):
         if isinstance(index, slice):
@@ -186,18 +198,91 @@ class NeoPixel:
     def brightness(self, brightness):
         # pylint: disable=attribute-defined-outside-init
         self._brightness = min(max(brightness, 0.0), 1.0)
+        self._build_luts()
+        if self.auto_write:
+            self.show()
+
+    def set_calibration(self, tables):
+        """Sets per channel lookup tables applied on output, on top of brightness.
+        :param tables: 256 byte tables for (R, G, B[, W]), or None to disable"""
+        # Tables that change nothing would only make show() build the output
+        # buffer byte by byte for the same result.
+        if tables is not None and all(bytes(table) == _IDENTITY for table in tables):
+            tables = None
+        self._calibration = tables
+        self._build_luts()
         if self.auto_write:
             self.show()
 
+    def _build_luts(self):
+        # Integer lookup tables combining calibration and brightness, one per
+        # byte position within a pixel, so show() only does one lookup per
+        # byte instead of float math.
+        brightness = self._brightness
+        tables = self._calibration
+        self._out_dirty = True
+        if tables is None:
+            if brightness > 0.99:
+                self._luts = None
+                return
+            lut = bytes(int(i * brightness) for i in range(256))
+            luts = [lut] * self.bpp
+        else:
+            luts = [None] * self.bpp
+            for channel in range(self.bpp):
+                table = tables[channel] if channel < len(tables) else range(256)
+                if brightness <= 0.99:
+                    table = bytes(int(i * brightness) for i in table)
+                luts[self.order[channel]] = table
+        self._luts = luts
+        if self._out is None:
+            self._out = bytearray(len(self.buf))
+            self._out_src = bytearray(len(self.buf))
+
     def fill(self, color):
         """Colors all pixels the given ***color***."""
-        auto_write = self.auto_write
-        self.auto_write = False
-        for i, _ in enumerate(self):
-            self[i] = color
-        if auto_write:
+        if not self.n:
+            return
+        # Encode the color once, then keep doubling the filled part of the
+        # buffer with slice copies.
+        self._encode(color, self.buf, 0)
+        total = len(self.buf)
+        filled = self.bpp
+        view = memoryview(self.buf)
+        while filled < total:
+            chunk = min(filled, total - filled)
+            view[filled:filled + chunk] = view[0:chunk]
+            filled += chunk
+        if self.auto_write:
+            self.show()
+
+    def set_many(self, indices, colors):
+        """Sets the pixels at ``indices`` at once.
+        :param indices: iterable of pixel indices
+        :param colors: flat buffer with ``bpp`` bytes (R, G, B[, W]) per index, in
+          the order of ``indices``"""
+        buf = self.buf
+        bpp = self.bpp
+        n = self.n
+        o_r, o_g, o_b = self.order[0], self.order[1], self.order[2]
+        o_w = self.order[3] if bpp == 4 else 0
+        src = 0
+        for index in indices:
+            if index < 0:
+                index += n
+            if index >= n or index < 0:
+                raise IndexError
+            if src + bpp > len(colors):
+                raise ValueError("Not enough colors for indices.")
+            offset = index * bpp
+            buf[offset + o_r] = colors[src]
+            buf[offset + o_g] = colors[src + 1]
+            buf[offset + o_b] = colors[src + 2]
+            if bpp == 4:
+                buf[offset + o_w] = colors[src + 3]
+            src += bpp
+        if self.auto_write:
             self.show()
-        self.auto_write = auto_write
 
     def write(self):
         """.. deprecated: 1.0.0
@@ -209,7 +294,20 @@ class NeoPixel:
         been autowritten.
         The colors may or may not be showing after this function returns because
         it may be done asynchronously."""
-        if self.brightness > 0.99:
+        if self._luts is None:
             neopixel_write(self.pin, self.buf)
-        else:
-            neopixel_write(self.pin, bytearray([int(i * self.brightness) for i in self.buf]))
\ No newline at end of file
+            return
+
+        buf = self.buf
+        out = self._out
+        # Only rebuild when the pixels, brightness or calibration changed
+        # since the last show().
+        if self._out_dirty or buf != self._out_src:
+            bpp = self.bpp
+            for position in range(bpp):
+                lut = self._luts[position]
+                for i in range(position, len(buf), bpp):
+                    out[i] = lut[buf[i]]
+            self._out_src[:] = buf
+            self._out_dirty = False
+        neopixel_write(self.pin, out)
\ No newline at end of file
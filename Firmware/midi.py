@@ -1,37 +1,468 @@
 import usb_midi
 import adafruit_midi
-from adafruit_midi.note_on import NoteOn
-from adafruit_midi.note_off import NoteOff
+import time
+from supervisor import ticks_ms
+from adafruit_midi import MIDIEvent
+from adafruit_midi.midi_message import note_parser
+from adafruit_midi.system_exclusive import SystemExclusiveStream
+from adafruit_midi.timing_clock import TimingClock
 
 from kmk.extensions import Extension
-from kmk.keys import make_argumented_key
+from kmk.handlers.stock import passthrough
+from kmk.keys import make_argumented_key, make_key
+from kmk.kmktime import ticks_add, ticks_diff
 
-def midi_key_validator(note):
-    return MidiNoteMeta(note)
+def midi_key_validator(note, velocity=None, channel=None, release_velocity=None):
+    return MidiNoteMeta(note_parser(note), velocity, channel, release_velocity)
 
 class MidiNoteMeta:
-    def __init__(self, note):
+    '''
+    A MIDI() key and its Note On / Note Off wire messages, built once by
+    compile() so pressing the key only copies three bytes to the output.
+    velocity, channel and release_velocity left as None follow the
+    extension's settings.
+    '''
+
+    def __init__(self, note, velocity=None, channel=None, release_velocity=None):
+        for value in (note, velocity, release_velocity):
+            if value is not None and not 0 <= value <= 127:
+                raise ValueError('Out of range')
+        if channel is not None and not 0 <= channel <= 15:
+            raise ValueError('Channel must be 0-15 or None')
         self.note = note
+        self.velocity = velocity
+        self.channel = channel
+        self.release_velocity = release_velocity
+        self.on = bytearray(3)
+        self.off = bytearray(3)
+
+    def compile(self, velocity, channel, release_velocity):
+        if self.channel is not None:
+            channel = self.channel
+        self.on[0] = 0x90 | channel
+        self.on[1] = self.note
+        self.on[2] = velocity if self.velocity is None else self.velocity
+        self.off[0] = 0x80 | channel
+        self.off[1] = self.note
+        self.off[2] = release_velocity if self.release_velocity is None else self.release_velocity
+
+class MidiVelocityMeta:
+    def __init__(self, step=1):
+        self.step = step
+        # Set by the extension, see MidiCCMeta
+        self.on_encoder_move = None
+
+class MidiCCMeta:
+    def __init__(self, control, value=0):
+        self.control = control
+        self.value = value
+        # Set by the extension, lets encoders send their accumulated delta
+        # as a single CC.
+        self.on_encoder_move = None
+
+class MidiBatch:
+    '''
+    Stands in for the MIDI out port: everything written during a main loop
+    iteration is collected in a preallocated buffer, in order, and goes out
+    in a single write on flush().
+
+    running_status leaves out repeated channel message status bytes. Only
+    use it on a serial (DIN) MIDI out: USB-MIDI carries every message in a
+    4 byte event packet of its own, so nothing is saved, and a data byte
+    without its status goes out as a single byte packet the host may drop.
+    '''
+
+    def __init__(self, port, size=64, running_status=False):
+        self.port = port
+        self.buf = bytearray(size)
+        self.length = 0
+        self.running_status = running_status
+        self._status = 0
+        self._messages = 0
+        # Messages sent by the last flush, and the number of flushes
+        self.messages = 0
+        self.flushes = 0
+
+    def write(self, packet, num):
+        buf = self.buf
+        for i in range(num):
+            byte = packet[i]
+            if byte >= 0x80:
+                self._messages += 1
+                if byte < 0xF0:
+                    if self.running_status and byte == self._status:
+                        continue
+                    self._status = byte
+                elif byte < 0xF8:
+                    # System common messages cancel running status, real
+                    # time ones don't
+                    self._status = 0
+            if self.length == len(buf):
+                # Full, send what we have and keep going
+                self.port.write(buf, self.length)
+                self.length = 0
+            buf[self.length] = byte
+            self.length += 1
+        return num
+
+    def write_message(self, message):
+        '''
+        Writes one complete message, as compiled for MIDI() keys. Without
+        running status it's copied in one slice instead of byte by byte.
+        '''
+        num = len(message)
+        if self.running_status or num > len(self.buf):
+            return self.write(message, num)
+        length = self.length
+        if length + num > len(self.buf):
+            self.port.write(self.buf, length)
+            length = 0
+        self.buf[length : length + num] = message
+        self.length = length + num
+        self._messages += 1
+        # Not tracked here: if running status is turned on later, the next
+        # message has to send its status
+        self._status = 0
+        return num
+
+    def flush(self):
+        if self.length:
+            self.port.write(self.buf, self.length)
+            self.length = 0
+            self.messages = self._messages
+            self._messages = 0
+            self.flushes += 1
+
+
+class MidiClock:
+    '''
+    24 PPQN MIDI clock driven by keyboard timeouts. Every tick is scheduled
+    against the clock's start time rather than the previous tick, with the
+    sub-millisecond remainder of the period carried over, so a late main
+    loop delays single ticks but never drifts the tempo.
+
+    Can also follow an incoming clock instead: the tempo is estimated from
+    the length of each beat (24 ticks), smoothed over the last few beats.
+    Beats outside min_bpm and max_bpm are left out.
+
+    Lateness of every tick sent, in ms, is kept in ticks_sent, late_total
+    and late_max.
+    '''
+
+    PPQN = 24
+
+    def __init__(self, midi, bpm=120, min_bpm=20, max_bpm=300):
+        self.midi = midi
+        self.keyboard = None
+        self.min_bpm = min_bpm
+        self.max_bpm = max_bpm
+        self.running = False
+        self._timeout = None
+        # Deadline of the next tick: _base (ticks_ms) plus _next_us
+        self._base = 0
+        self._next_us = 0
+        self._period_us = 0
+        self.set_bpm(bpm)
+
+        self._last_tap = None
+        self._tap_ms = 0
+
+        self._in_count = 0
+        self._in_start = 0
+        self._in_last = 0
+        self._beat_ms = 0
+
+        self.ticks_sent = 0
+        self.late_total = 0
+        self.late_max = 0
+
+    def set_bpm(self, bpm):
+        bpm = min(max(bpm, self.min_bpm), self.max_bpm)
+        self.bpm = bpm
+        if self.running:
+            # Keep the next tick where it is, the new period applies after
+            self._base = ticks_add(self._base, self._next_us // 1000)
+            self._next_us %= 1000
+        self._period_us = int(60000000 / (bpm * self.PPQN))
+
+    def start(self):
+        if self.running:
+            return
+        self.midi.send_realtime(0xFA)
+        self.running = True
+        self._base = ticks_ms()
+        self._next_us = 0
+        self._tick()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.midi.send_realtime(0xFC)
+        self.running = False
+        if self._timeout is not None:
+            self.keyboard.cancel_timeout(self._timeout)
+            self._timeout = None
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def reset_stats(self):
+        self.ticks_sent = 0
+        self.late_total = 0
+        self.late_max = 0
+
+    def _tick(self):
+        self._timeout = None
+        if not self.running:
+            return
+
+        # Sends every tick that's due, so loops slower than the tick period
+        # don't fall behind. Bounded to a beat after a long stall.
+        now = ticks_ms()
+        for _ in range(self.PPQN):
+            late = ticks_diff(now, ticks_add(self._base, self._next_us // 1000))
+            if late < 0:
+                break
+            self.midi.send_realtime(0xF8)
+            self.ticks_sent += 1
+            self.late_total += late
+            if late > self.late_max:
+                self.late_max = late
+
+            next_us = self._next_us + self._period_us
+            if next_us >= 1000000:
+                # Move whole seconds into the base so the offset stays small
+                self._base = ticks_add(self._base, 1000)
+                next_us -= 1000000
+            self._next_us = next_us
+
+        delay = ticks_diff(ticks_add(self._base, self._next_us // 1000), now)
+        self._timeout = self.keyboard.set_timeout(
+            delay if delay > 0 else False, self._tick
+        )
+
+    def tap(self):
+        '''
+        Sets the tempo from the time between taps, averaged over consecutive
+        taps. A pause of two seconds starts over, taps closer than max_bpm
+        allows are bounces and ignored.
+        '''
+        now = ticks_ms()
+        if self._last_tap is not None:
+            interval = ticks_diff(now, self._last_tap)
+            if interval * self.max_bpm < 60000:
+                return
+            if interval < 2000:
+                if self._tap_ms:
+                    self._tap_ms = (self._tap_ms * 3 + interval) // 4
+                else:
+                    self._tap_ms = interval
+                self.set_bpm(60000 / self._tap_ms)
+            else:
+                self._tap_ms = 0
+        self._last_tap = now
+
+    def clock_in(self):
+        '''
+        Called for every incoming Timing Clock while following.
+        '''
+        now = ticks_ms()
+        if self._in_count and ticks_diff(now, self._in_last) > 500:
+            # The source stopped for a while, don't count the gap
+            self._in_count = 0
+        self._in_last = now
+        if not self._in_count:
+            self._in_start = now
+        elif self._in_count == self.PPQN:
+            beat = ticks_diff(now, self._in_start)
+            if beat * self.max_bpm < 60000 or beat * self.min_bpm > 60000:
+                # Ticks are timed when they're handled, not when they came
+                # in: a backlog read in one go makes a beat far too short.
+                # Measure again from here instead.
+                self._in_start = now
+                self._in_count = 1
+                return
+            if self._beat_ms:
+                self._beat_ms = (self._beat_ms * 3 + beat) / 4
+            else:
+                self._beat_ms = beat
+            self.set_bpm(60000 / self._beat_ms)
+            self._in_start = now
+            self._in_count = 0
+        self._in_count += 1
+
 
 class Midi(Extension):
 
-        def __init__(self, port = 1, out_channel = 0):
+        def __init__(self, port = 1, out_channel = 0, velocity = 120, release_velocity = 120, batch_size = 64,
+                     in_port = None, in_channel = None, max_messages = 8, max_us = 1000, sysex_handler = None,
+                     clock_bpm = 120, follow_clock = False):
+
+            #  MIDI setup as MIDI out device, writes are batched and sent once
+            #  per loop in after_hid_send. No running status, see MidiBatch.
+            self.batch = MidiBatch(usb_midi.ports[port], batch_size)
+            midi_in = usb_midi.ports[in_port] if in_port is not None else None
+            #  Incoming SysEx of any size is streamed to sysex_handler, see
+            #  SystemExclusiveStream
+            self.sysex = SystemExclusiveStream(sysex_handler) if sysex_handler else None
+            self.MIDI = adafruit_midi.MIDI(midi_in=midi_in, midi_out=self.batch, in_channel=in_channel, out_channel=out_channel, sysex_stream=self.sysex)
+            self.out_channel = out_channel
+            self.velocity = velocity
+            self.default_velocity = velocity
+            self.release_velocity = release_velocity
+            #  Compiled MIDI() keys, see set_velocity
+            self._notes = []
 
-            #  MIDI setup as MIDI out device
-            self.MIDI = adafruit_midi.MIDI(midi_out=usb_midi.ports[port], out_channel=out_channel)
+            #  MIDI in, e.g. in_port = 0: at most max_messages are read and
+            #  handed to handlers per loop, and reading stops once max_us
+            #  have passed, so a flood of input can't hold up key scanning.
+            self.midi_in = midi_in
+            self.max_messages = max_messages
+            self.max_us = max_us
+            self.handlers = {}
+            self._event = MIDIEvent()
+            self._keyboard = None
+            #  Input statistics: messages handled, loops that stopped at
+            #  max_messages or max_us with input possibly left over, and
+            #  messages no handler was registered for
+            self.messages_in = 0
+            self.capped_loops = 0
+            self.over_budget_loops = 0
+            self.unhandled = 0
+
+            #  MIDI clock out, started and stopped with MIDI_CLOCK, tempo set
+            #  with MIDI_TAP or, with follow_clock, by the clock coming in
+            self.clock = MidiClock(self.MIDI, clock_bpm)
+            if follow_clock:
+                self.add_handler(TimingClock, self._clock_in)
 
             make_argumented_key(
-                validator=midi_key_validator,
+                validator=self._note_validator,
                 names=('MIDI',),
                 on_press=self._on_n,
                 on_release=self._off_n,
             )
 
+            make_argumented_key(
+                validator=self._cc_validator,
+                names=('MIDI_CC',),
+                on_press=self._cc,
+                on_release=passthrough,
+            )
+
+            #  Turned on an encoder, changes the velocity of all MIDI() keys
+            #  without their own by step per detent. Pressing it restores the
+            #  configured velocity.
+            make_argumented_key(
+                validator=self._velocity_validator,
+                names=('MIDI_VEL',),
+                on_press=self._velocity_reset,
+                on_release=passthrough,
+            )
+
+            make_key(
+                names=('MIDI_CLOCK',),
+                on_press=self._clock_toggle,
+                on_release=passthrough,
+            )
+
+            make_key(
+                names=('MIDI_TAP',),
+                on_press=self._clock_tap,
+                on_release=passthrough,
+            )
+
+        def _note_validator(self, note, velocity=None, channel=None, release_velocity=None):
+            meta = midi_key_validator(note, velocity, channel, release_velocity)
+            meta.compile(self.velocity, self.out_channel, self.release_velocity)
+            self._notes.append(meta)
+            return meta
+
+        def _velocity_validator(self, step=1):
+            meta = MidiVelocityMeta(step)
+            meta.on_encoder_move = self._velocity_move
+            return meta
+
+        def set_velocity(self, velocity):
+            '''
+            Sets the Note On velocity of every MIDI() key that doesn't have
+            its own, patching the compiled messages in place.
+            '''
+            velocity = min(max(velocity, 1), 127)
+            self.velocity = velocity
+            for meta in self._notes:
+                if meta.velocity is None:
+                    meta.on[2] = velocity
+
+        def _cc_validator(self, control, value=0):
+            meta = MidiCCMeta(control, value)
+            meta.on_encoder_move = self._cc_move
+            return meta
+
         def _on_n(self, key, keyboard, *args, **kwargs):
-            self.MIDI.send(NoteOn((key.meta.note), 120))
+            self.batch.write_message(key.meta.on)
 
         def _off_n(self, key, keyboard, *args, **kwargs):
-            self.MIDI.send(NoteOff((key.meta.note), 120))
+            self.batch.write_message(key.meta.off)
+
+        def _velocity_move(self, key, keyboard, steps):
+            self.set_velocity(self.velocity + steps * key.meta.step)
+
+        def _velocity_reset(self, key, keyboard, *args, **kwargs):
+            self.set_velocity(self.default_velocity)
+
+        def _cc(self, key, keyboard, *args, **kwargs):
+            self.MIDI.send_control_change(key.meta.control, key.meta.value)
+
+        def _cc_move(self, key, keyboard, steps):
+            value = min(max(key.meta.value + steps, 0), 127)
+            if value != key.meta.value:
+                key.meta.value = value
+                self._cc(key, keyboard)
+
+        def _clock_toggle(self, key, keyboard, *args, **kwargs):
+            self.clock.toggle()
+
+        def _clock_tap(self, key, keyboard, *args, **kwargs):
+            self.clock.tap()
+
+        def _clock_in(self, event, keyboard):
+            self.clock.clock_in()
+
+        def add_handler(self, msgclass, handler):
+            '''
+            Calls handler(event, keyboard) for every received message of
+            msgclass, e.g. NoteOn or ControlChange. event is a MIDIEvent
+            record that is reused for the next message, note / control
+            number in data1, velocity / value in data2.
+            '''
+            self.handlers.setdefault(msgclass, []).append(handler)
+
+        def _receive(self):
+            event = self._event
+            start = time.monotonic_ns()
+            budget_ns = self.max_us * 1000
+            count = 0
+            while True:
+                if count == self.max_messages:
+                    self.capped_loops += 1
+                    break
+                if time.monotonic_ns() - start > budget_ns:
+                    self.over_budget_loops += 1
+                    break
+                if self.MIDI.receive_event(event) is None:
+                    break
+                count += 1
+                handlers = self.handlers.get(event.msgclass)
+                if handlers:
+                    for handler in handlers:
+                        handler(event, self._keyboard)
+                else:
+                    self.unhandled += 1
+            self.messages_in += count
 
         def on_runtime_enable(self, sandbox):
             return
@@ -39,11 +470,13 @@ class Midi(Extension):
         def on_runtime_disable(self, sandbox):
             return
 
-        def during_bootup(self, sandbox):
-            return
+        def during_bootup(self, keyboard):
+            self._keyboard = keyboard
+            self.clock.keyboard = keyboard
 
         def before_matrix_scan(self, sandbox):
-            return
+            if self.midi_in is not None:
+                self._receive()
 
         def after_matrix_scan(self, sandbox):
             return
@@ -52,7 +485,7 @@ class Midi(Extension):
             return
 
         def after_hid_send(self, sandbox):
-            return
+            self.batch.flush()
 
         def on_powersave_enable(self, sandbox):
             return
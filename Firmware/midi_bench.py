@@ -0,0 +1,420 @@
+'''
+MIDI benchmarks, run on the keyboard from the REPL:
+
+    import midi_bench
+    midi_bench.run()
+
+On the host, from Firmware/tests with the stand-ins installed, the clock
+has to be moved on for tap dance to resolve:
+
+    import circuitpython
+    import midi_bench
+    midi_bench.run(advance=circuitpython.advance)
+
+MIDI goes to and comes from a StubPort in place of the usb_midi ports, so
+nothing is sent to the host and the numbers don't depend on it. Every
+result is printed as one line of JSON, keep the output of two runs to
+compare them.
+
+- encode.*: sending each message type, objects and the fast paths
+- parse.*: receiving recorded clock, note, CC sweep and SysEx streams,
+  checking every message is parsed
+- keypress.*: matrix scan of a key press to the MIDI write, through
+  KMKKeyboard with Layers, TapDance and the Midi extension as in code.py
+'''
+import gc
+import json
+import sys
+import time
+
+import adafruit_midi
+from adafruit_midi import MIDIEvent
+from adafruit_midi.control_change import ControlChange
+from adafruit_midi.midi_message import MIDIBadEvent, MIDIUnknownEvent
+from adafruit_midi.note_off import NoteOff
+from adafruit_midi.note_on import NoteOn
+from adafruit_midi.pitch_bend import PitchBend
+from adafruit_midi.system_exclusive import SystemExclusive, SystemExclusiveStream
+
+from kmk.hid import HIDModes
+from kmk.keys import KC
+from kmk.kmk_keyboard import KMKKeyboard
+from kmk.matrix import DiodeOrientation
+from kmk.modules.layers import Layers
+from kmk.modules.tapdance import TapDance
+from midi import Midi
+
+
+class StubPort:
+    '''
+    Stands in for a usb_midi port. Writes are counted and timestamped,
+    reads return a recorded stream in chunks of up to chunk bytes, like
+    USB packets arrive.
+    '''
+
+    def __init__(self, stream=b'', chunk=64):
+        self.stream = stream
+        self.chunk = chunk
+        self.pos = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.write_ns = 0
+
+    def rewind(self):
+        self.pos = 0
+
+    @property
+    def drained(self):
+        return self.pos == len(self.stream)
+
+    def write(self, buf, num):
+        self.write_ns = time.monotonic_ns()
+        self.writes += 1
+        self.bytes_written += num
+        return num
+
+    def read(self, nbytes):
+        num = min(nbytes, self.chunk, len(self.stream) - self.pos)
+        data = self.stream[self.pos : self.pos + num]
+        self.pos += num
+        return data
+
+    def readinto(self, buf, nbytes):
+        num = min(nbytes, self.chunk, len(self.stream) - self.pos)
+        buf[0:num] = self.stream[self.pos : self.pos + num]
+        self.pos += num
+        return num
+
+
+class ScriptedMatrix:
+    '''
+    Matrix scanner reporting presses and releases queued by press() and
+    release() instead of reading pins, one per scan like MatrixScanner.
+    '''
+
+    def __init__(self, cols, rows, diode_orientation=None, rollover_cols_every_rows=None):
+        self.report = bytearray(3)
+        self.queue = []
+        self.scan_ns = 0
+
+    def press(self, row, col):
+        self.queue.append((row, col, 1))
+
+    def release(self, row, col):
+        self.queue.append((row, col, 0))
+
+    def scan_for_changes(self):
+        if not self.queue:
+            return None
+        self.report[0], self.report[1], self.report[2] = self.queue.pop(0)
+        self.scan_ns = time.monotonic_ns()
+        return self.report
+
+
+def clock_stream(beats=16):
+    return bytes([0xFA] + [0xF8] * (24 * beats) + [0xFC])
+
+
+def note_stream(notes=64):
+    data = bytearray()
+    for i in range(notes):
+        data.extend((0x90, 36 + i % 64, 100, 0x80, 36 + i % 64, 64))
+    return bytes(data)
+
+
+def cc_sweep_stream(sweeps=2):
+    data = bytearray()
+    for _ in range(sweeps):
+        for value in range(128):
+            data.extend((0xB0, 7, value))
+    return bytes(data)
+
+
+def sysex_stream(messages=8, length=120):
+    data = bytearray()
+    for i in range(messages):
+        data.extend((0xF0, 0x7D))
+        data.extend((i + j) & 0x7F for j in range(length))
+        data.append(0xF7)
+    return bytes(data)
+
+
+def _report(result):
+    print(json.dumps(result))
+    return result
+
+
+def _alloc_per_op(func, n=20):
+    # Bytes allocated by one call, where the gc module can tell
+    mem_alloc = getattr(gc, 'mem_alloc', None)
+    if mem_alloc is None:
+        return None
+    gc.collect()
+    gc.disable()
+    try:
+        before = mem_alloc()
+        for _ in range(n):
+            func()
+        return (mem_alloc() - before) // n
+    finally:
+        gc.enable()
+
+
+def bench_encode(n=500):
+    port = StubPort()
+    midi = adafruit_midi.MIDI(midi_out=port, out_channel=0)
+    sysex_data = bytes(range(32))
+    midi_ext = Midi()
+    midi_ext.batch.port = port
+    note = KC.MIDI(60)
+
+    def compiled_note():
+        midi_ext._on_n(note, None)
+        midi_ext.batch.flush()
+
+    cases = (
+        ('encode.note_on.object', lambda: midi.send(NoteOn(60, 100))),
+        ('encode.note_on.fast', lambda: midi.send_note_on(60, 100)),
+        ('encode.note_on.compiled', compiled_note),
+        ('encode.note_off.object', lambda: midi.send(NoteOff(60, 64))),
+        ('encode.note_off.fast', lambda: midi.send_note_off(60, 64)),
+        ('encode.control_change.object', lambda: midi.send(ControlChange(7, 100))),
+        ('encode.control_change.fast', lambda: midi.send_control_change(7, 100)),
+        ('encode.pitch_bend.object', lambda: midi.send(PitchBend(8192))),
+        ('encode.timing_clock.fast', lambda: midi.send_realtime(0xF8)),
+        ('encode.sysex_32.object', lambda: midi.send(SystemExclusive([0x7D], sysex_data))),
+    )
+
+    results = []
+    for name, func in cases:
+        gc.collect()
+        port.bytes_written = 0
+        start = time.monotonic_ns()
+        for _ in range(n):
+            func()
+        elapsed_ns = time.monotonic_ns() - start
+        results.append(_report({
+            'bench': name,
+            'n': n,
+            'us_per_msg': elapsed_ns / n / 1000,
+            'msgs_per_s': int(n * 1000000000 / elapsed_ns) if elapsed_ns else None,
+            'bytes_per_msg': port.bytes_written // n,
+            'alloc_per_msg': _alloc_per_op(func),
+        }))
+    return results
+
+
+def _is_parsed(msg):
+    # Anything but an unknown status or a malformed message
+    msgclass = msg.msgclass if isinstance(msg, MIDIEvent) else type(msg)
+    return msgclass is not MIDIUnknownEvent and msgclass is not MIDIBadEvent
+
+
+def _drain(midi, port, receive):
+    # Parses until the port is drained and two receives in a row come back
+    # empty, i.e. nothing complete is left in the input buffer. Returns the
+    # messages parsed and the unknown or malformed ones.
+    parsed = 0
+    unparsed = 0
+    empty = 0
+    while empty < 2:
+        msg = receive()
+        if msg is None:
+            if port.drained:
+                empty += 1
+        else:
+            if _is_parsed(msg):
+                parsed += 1
+            else:
+                unparsed += 1
+            empty = 0
+    return parsed, unparsed
+
+
+def bench_parse(rounds=5):
+    # Streams with the messages and the unknown ones they must give, Start
+    # and Stop aren't registered on the keyboard
+    streams = (
+        ('clock', clock_stream(), 16 * 24, 2),
+        ('notes', note_stream(), 128, 0),
+        ('cc_sweep', cc_sweep_stream(), 256, 0),
+        ('sysex', sysex_stream(), 8, 0),
+    )
+    sysex_bytes = [0]
+
+    def on_sysex(manufacturer_id, chunk, last):
+        sysex_bytes[0] += len(chunk)
+
+    results = []
+    for name, stream, expected, expected_unknown in streams:
+        port = StubPort(stream)
+        event = MIDIEvent()
+        # A SysEx has to be read and parsed in one go, the input buffer and
+        # the reads must hold all of one. In 64 byte USB packets only the
+        # stream handler can take it.
+        buf_size = 128 if name == 'sysex' else 64
+        paths = (
+            ('object', adafruit_midi.MIDI(midi_in=port, in_buf_size=buf_size), None, buf_size),
+            ('event', adafruit_midi.MIDI(midi_in=port, in_buf_size=buf_size), event, buf_size),
+        )
+        if name == 'sysex':
+            paths += ((
+                'stream',
+                adafruit_midi.MIDI(
+                    midi_in=port,
+                    in_buf_size=64,
+                    sysex_stream=SystemExclusiveStream(on_sysex),
+                ),
+                event,
+                64,
+            ),)
+
+        for path, midi, record, chunk in paths:
+            if record is None:
+                receive = midi.receive
+            else:
+                receive = lambda: midi.receive_event(record)  # NOQA
+            port.chunk = chunk
+            gc.collect()
+            sysex_bytes[0] = 0
+            messages = 0
+            unknown = 0
+            start = time.monotonic_ns()
+            for _ in range(rounds):
+                port.rewind()
+                parsed, unparsed = _drain(midi, port, receive)
+                messages += parsed
+                unknown += unparsed
+            elapsed_ns = time.monotonic_ns() - start
+            total = len(stream) * rounds
+            messages //= rounds
+            unknown //= rounds
+            sysex_bytes[0] //= rounds
+            bench = 'parse.{}.{}'.format(name, path)
+            if path == 'stream':
+                # Handed over as data instead of messages
+                assert (messages, sysex_bytes[0]) == (0, expected * 120), bench
+            else:
+                assert (messages, unknown) == (expected, expected_unknown), bench
+            results.append(_report({
+                'bench': bench,
+                'n': rounds,
+                'bytes': total,
+                'messages': messages,
+                'unknown': unknown,
+                'sysex_bytes': sysex_bytes[0],
+                'us_per_byte': elapsed_ns / total / 1000,
+                'bytes_per_s': int(total * 1000000000 / elapsed_ns) if elapsed_ns else None,
+            }))
+    return results
+
+
+def _keyboard(port):
+    keyboard = KMKKeyboard()
+    tapdance = TapDance()
+    tapdance.tap_time = 250
+    keyboard.modules = [Layers(), tapdance]
+    midi_ext = Midi()
+    midi_ext.batch.port = port
+    keyboard.extensions = [midi_ext]
+    keyboard.debug_enabled = False
+
+    keyboard.matrix_scanner = ScriptedMatrix
+    keyboard.col_pins = (None, None)
+    keyboard.row_pins = (None,)
+    keyboard.diode_orientation = DiodeOrientation.COL2ROW
+    keyboard.keymap = [
+        [KC.MIDI(60), KC.TD(KC.MIDI(70), KC.NO, KC.NO, KC.TO(0))],
+    ]
+    keyboard._init(hid_type=HIDModes.NOOP)
+    return keyboard
+
+
+def _settle(keyboard, main_loop, max_loops=10000):
+    # Runs the loop until no timeouts (tap dance, key removal) are left
+    loops = 0
+    while keyboard._timeouts and loops < max_loops:
+        main_loop()
+        loops += 1
+
+
+def bench_keypress(n=50, idle_loops=200, advance=None):
+    '''
+    :param advance: moves the clock on by some milliseconds, on the host
+      circuitpython.advance from the tests, as time only passes there when
+      moved. Every main loop then takes a millisecond, so tap dance
+      resolves, and the latencies are the time spent running the loops
+      without the milliseconds moved on. Leave it None on the keyboard.
+    '''
+    port = StubPort()
+    keyboard = _keyboard(port)
+    matrix = keyboard.matrix
+
+    def main_loop():
+        keyboard._main_loop()
+        if advance is not None:
+            advance(1)
+
+    results = []
+
+    gc.collect()
+    start = time.monotonic_ns()
+    for _ in range(idle_loops):
+        main_loop()
+    elapsed_ns = time.monotonic_ns() - start
+    results.append(_report({
+        'bench': 'keypress.idle_loop',
+        'n': idle_loops,
+        'us_per_loop': elapsed_ns / idle_loops / 1000,
+    }))
+
+    # Plain MIDI() key on column 0, tap danced one on column 1, which only
+    # resolves after tap_time
+    for name, col in (('keypress.note', 0), ('keypress.tapdance_note', 1)):
+        latencies = []
+        loops = 0
+        for _ in range(n):
+            writes = port.writes
+            matrix.press(0, col)
+            deadline = time.monotonic_ns() + 1000000000
+            while port.writes == writes and time.monotonic_ns() < deadline:
+                main_loop()
+                loops += 1
+            if port.writes == writes:
+                continue
+            latencies.append((port.write_ns - matrix.scan_ns) // 1000)
+            matrix.release(0, col)
+            main_loop()
+            _settle(keyboard, main_loop)
+            # Let the next press start at a fresh loop
+            main_loop()
+
+        latencies.sort()
+        count = len(latencies)
+        results.append(_report({
+            'bench': name,
+            'n': n,
+            'missed': n - count,
+            'loops_per_note': loops / count if count else None,
+            'latency_us_min': latencies[0] if count else None,
+            'latency_us_median': latencies[count // 2] if count else None,
+            'latency_us_max': latencies[-1] if count else None,
+        }))
+    return results
+
+
+def run(n=500, rounds=5, presses=50, advance=None):
+    '''
+    Runs all benchmarks and returns the results, which are also printed as
+    one JSON object per line. See bench_keypress() for advance.
+    '''
+    results = [_report({
+        'bench': 'meta',
+        'platform': sys.platform,
+        'implementation': sys.implementation.name,
+        'version': sys.version,
+    })]
+    results.extend(bench_encode(n))
+    results.extend(bench_parse(rounds))
+    results.extend(bench_keypress(presses, advance=advance))
+    return results
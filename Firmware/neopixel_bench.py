@@ -0,0 +1,149 @@
+'''
+NeoPixel benchmark, run on the keyboard from the REPL with the strip's pin:
+
+    import board
+    import neopixel_bench
+    neopixel_bench.run(board.D10)
+
+Sets 4, 64 and 300 pixels with fill() and set_many() and, to compare,
+with fill() as it was, a loop over __setitem__, and a slice assignment.
+auto_write is off and show() isn't called, so these time writing the
+buffer only. The show.* cases then fill() and show() a new color per call
+without calibration, with the identity ColorProfile and with WS2812's, at
+full and at 25% brightness. Those do write to the strip, dimly.
+
+Every case prints the time and the bytes allocated per call as one line
+of JSON.
+
+Allocations are counted with gc.mem_alloc(), which CPython doesn't have,
+alloc_bytes is null there.
+'''
+import gc
+import json
+import sys
+import time
+
+import neopixel
+from kmk.extensions.rgb import ColorProfile, ColorProfiles
+
+_COLOR = (12, 34, 56)
+
+
+def _allocated(func):
+    mem_alloc = getattr(gc, 'mem_alloc', None)
+    if mem_alloc is None:
+        func()
+        return None
+    gc.collect()
+    gc.disable()
+    try:
+        before = mem_alloc()
+        func()
+        return mem_alloc() - before
+    finally:
+        gc.enable()
+
+
+def _report(result):
+    print(json.dumps(result))
+    return result
+
+
+def _cases(pixels):
+    indices = range(pixels.n)
+    colors = bytes(_COLOR) * pixels.n
+    per_pixel = [_COLOR] * pixels.n
+
+    def fill_old():
+        # fill() as it was before it wrote the buffer in bulk
+        auto_write = pixels.auto_write
+        pixels.auto_write = False
+        for i, _ in enumerate(pixels):
+            pixels[i] = _COLOR
+        if auto_write:
+            pixels.show()
+        pixels.auto_write = auto_write
+
+    def set_slice():
+        pixels[0 : pixels.n] = per_pixel
+
+    return (
+        ('fill.old', fill_old),
+        ('fill', lambda: pixels.fill(_COLOR)),
+        ('set.slice', set_slice),
+        ('set_many', lambda: pixels.set_many(indices, colors)),
+    )
+
+
+def _time(name, n, calls, func):
+    func()
+    gc.collect()
+    start = time.monotonic_ns()
+    for _ in range(calls):
+        func()
+    elapsed_ns = time.monotonic_ns() - start
+    return _report({
+        'bench': '{}.{}'.format(name, n),
+        'pixels': n,
+        'calls': calls,
+        'alloc_bytes': _allocated(func),
+        'us_per_call': elapsed_ns / calls / 1000,
+    })
+
+
+def bench(pin, n, calls=100):
+    pixels = neopixel.NeoPixel(pin, n, pixel_order=neopixel.GRB, auto_write=False)
+    try:
+        return [_time(name, n, calls, func) for name, func in _cases(pixels)]
+    finally:
+        pixels.pin.deinit()
+
+
+def bench_show(pin, n, calls=100):
+    # fill() and show() with a new color every call, so the output is
+    # built anew each time, without calibration, through the identity
+    # profile and through a real one, at full and at idle brightness
+    profiles = (
+        ('none', None),
+        ('identity', ColorProfile()),
+        ('ws2812', ColorProfiles.WS2812),
+    )
+    colors = [(i, 255 - i, i // 2) for i in range(0, 256, 5)]
+    results = []
+    for brightness in (1.0, 0.25):
+        for name, profile in profiles:
+            pixels = neopixel.NeoPixel(
+                pin, n, pixel_order=neopixel.GRB, brightness=brightness, auto_write=False
+            )
+            if profile is not None:
+                pixels.set_calibration(profile.tables())
+            step = [0]
+
+            def fill_show():
+                step[0] = (step[0] + 1) % len(colors)
+                pixels.fill(colors[step[0]])
+                pixels.show()
+
+            try:
+                results.append(_time(
+                    'show.{}.{}'.format(name, int(brightness * 100)), n, calls, fill_show
+                ))
+            finally:
+                pixels.pin.deinit()
+    return results
+
+
+def run(pin=None, calls=100):
+    '''
+    Runs all cases and returns the results, which are also printed as one
+    JSON object per line.
+    '''
+    results = [_report({
+        'bench': 'meta',
+        'platform': sys.platform,
+        'implementation': sys.implementation.name,
+    })]
+    for n in (4, 64, 300):
+        results.extend(bench(pin, n, calls))
+        results.extend(bench_show(pin, n, calls))
+    return results
@@ -0,0 +1,88 @@
+'''
+RGB benchmark, run on the keyboard from the REPL:
+
+    import rgb_bench
+    rgb_bench.run()
+
+Times RGB.hsv_to_rgb against the float conversion it replaced, which
+rgb.py keeps for inputs the tables don't cover, and prints the time per
+conversion as one line of JSON per case:
+
+- hsv.*.hues: every hue at full saturation and value, as rainbow walks them
+- hsv.*.mixed: hues, saturations and values all over the range
+- hsv.*.swirl_64: one swirl frame of 64 pixels, per frame
+
+Only the conversion is timed, no pixels are set up or written.
+'''
+import gc
+import json
+import sys
+import time
+
+from kmk.extensions.rgb import RGB, _float_hsv_to_rgb
+
+
+def _converter(val_limit):
+    # hsv_to_rgb only needs val_limit, leave out the pixels
+    ext = RGB.__new__(RGB)
+    ext.val_limit = val_limit
+    return ext
+
+
+def _report(result):
+    print(json.dumps(result))
+    return result
+
+
+def _inputs():
+    hues = [(hue, 100, 100) for hue in range(360)]
+    mixed = [
+        (hue, sat, val)
+        for hue in range(0, 360, 7)
+        for sat in range(0, 101, 20)
+        for val in range(0, 101, 20)
+    ]
+    swirl = [((200 - i * 64) % 360, 100, 100) for i in range(64)]
+    return (('hues', hues), ('mixed', mixed), ('swirl_64', swirl))
+
+
+def bench(rounds=5, val_limit=100):
+    # All inputs are within val_limit, the float conversion needs no limiting
+    paths = (('float', _float_hsv_to_rgb), ('table', _converter(val_limit).hsv_to_rgb))
+
+    results = []
+    for name, inputs in _inputs():
+        per_path = {}
+        for path, convert in paths:
+            gc.collect()
+            start = time.monotonic_ns()
+            for _ in range(rounds):
+                for hue, sat, val in inputs:
+                    convert(hue, sat, val)
+            elapsed_ns = time.monotonic_ns() - start
+            per_path[path] = elapsed_ns
+            result = {
+                'bench': 'hsv.{}.{}'.format(path, name),
+                'n': rounds * len(inputs),
+                'us_per_call': elapsed_ns / (rounds * len(inputs)) / 1000,
+            }
+            if name == 'swirl_64':
+                result['us_per_frame'] = elapsed_ns / rounds / 1000
+            if path == 'table':
+                result['speedup'] = per_path['float'] / elapsed_ns if elapsed_ns else None
+            results.append(_report(result))
+    return results
+
+
+def run(rounds=5):
+    '''
+    Runs all cases and returns the results, which are also printed as one
+    JSON object per line.
+    '''
+    results = [_report({
+        'bench': 'meta',
+        'platform': sys.platform,
+        'implementation': sys.implementation.name,
+    })]
+    results.extend(bench(rounds))
+    return results
@@ -0,0 +1,128 @@
+'''
+The MIDI input parser as it was before the status table, the fixed input
+buffer and event records: a linear scan of the registered message types,
+and an input buffer resliced after every message. Kept as the reference
+the current parser has to agree with.
+'''
+from adafruit_midi.midi_message import (
+    MIDIBadEvent,
+    MIDIMessage,
+    MIDIUnknownEvent,
+    channel_filter,
+)
+
+
+def match_message_status(buf, msgstartidx, msgendidxplusone, endidx):
+    msgclass = None
+    status = buf[msgstartidx]
+    known_msg = False
+    complete_msg = False
+    bad_termination = False
+
+    for status_mask, msgclass in MIDIMessage._statusandmask_to_class:
+        masked_status = status & status_mask[1]
+        if status_mask[0] == masked_status:
+            known_msg = True
+            complete_msg = len(buf) - msgstartidx >= msgclass.LENGTH
+            if not complete_msg:
+                break
+
+            if msgclass.LENGTH < 0:
+                (
+                    msgendidxplusone,
+                    terminated_msg,
+                    bad_termination,
+                ) = MIDIMessage._search_eom_status(
+                    buf, msgclass.ENDSTATUS, msgstartidx, msgendidxplusone, endidx
+                )
+                if not terminated_msg:
+                    complete_msg = False
+            else:
+                msgendidxplusone = msgstartidx + msgclass.LENGTH
+            break
+
+    return (
+        msgclass,
+        status,
+        known_msg,
+        complete_msg,
+        bad_termination,
+        msgendidxplusone,
+    )
+
+
+def from_message_bytes(midibytes, channel_in):
+    endidx = len(midibytes) - 1
+    skipped = 0
+    preamble = True
+
+    msgstartidx = 0
+    msgendidxplusone = 0
+    while True:
+        msg = None
+        while msgstartidx <= endidx and not midibytes[msgstartidx] & 0x80:
+            msgstartidx += 1
+            if preamble:
+                skipped += 1
+        preamble = False
+
+        if msgstartidx > endidx:
+            return (None, endidx + 1, skipped)
+
+        (
+            msgclass,
+            status,
+            known_message,
+            complete_message,
+            bad_termination,
+            msgendidxplusone,
+        ) = match_message_status(midibytes, msgstartidx, msgendidxplusone, endidx)
+        channel_match_orna = True
+        if complete_message and not bad_termination:
+            try:
+                msg = msgclass.from_bytes(midibytes[msgstartidx:msgendidxplusone])
+                if msg.channel is not None:
+                    channel_match_orna = channel_filter(msg.channel, channel_in)
+
+            except (ValueError, TypeError) as ex:
+                msg = MIDIBadEvent(midibytes[msgstartidx:msgendidxplusone], ex)
+
+        if known_message:
+            if complete_message:
+                if channel_match_orna:
+                    break
+                msgstartidx = msgendidxplusone
+            else:
+                break
+        else:
+            msg = MIDIUnknownEvent(status)
+            msgendidxplusone = msgstartidx + 1
+            break
+
+    return (msg, msgendidxplusone, skipped)
+
+
+class MIDI:
+    '''MIDI input only, with receive() as it was.'''
+
+    def __init__(self, midi_in, in_channel=None, in_buf_size=30):
+        self._midi_in = midi_in
+        if in_channel is None:
+            in_channel = tuple(range(16))
+        self._in_channel = in_channel
+        self._in_buf = bytearray()
+        self._in_buf_size = in_buf_size
+        self._skipped_bytes = 0
+
+    def receive(self):
+        if len(self._in_buf) < self._in_buf_size:
+            bytes_in = self._midi_in.read(self._in_buf_size - len(self._in_buf))
+            if bytes_in:
+                self._in_buf.extend(bytes_in)
+
+        (msg, endplusone, skipped) = from_message_bytes(self._in_buf, self._in_channel)
+        if endplusone != 0:
+            self._in_buf = self._in_buf[endplusone:]
+
+        self._skipped_bytes += skipped
+        return msg
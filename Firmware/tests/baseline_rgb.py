@@ -0,0 +1,50 @@
+'''
+RGB.hsv_to_rgb as it was before the lookup tables, in floats. Kept as the
+reference the current conversion has to agree with.
+'''
+
+
+def hsv_to_rgb(hue, sat, val, val_limit):
+    if val > val_limit:
+        val = val_limit
+
+    if sat == 0:
+        r = val
+        g = val
+        b = val
+
+    else:
+        base = ((100 - sat) * val) / 100
+        color = (val - base) * ((hue % 60) / 60)
+
+        x = int(hue / 60)
+        if x == 0:
+            r = val
+            g = base + color
+            b = base
+        elif x == 1:
+            r = val - color
+            g = val
+            b = base
+        elif x == 2:
+            r = base
+            g = val
+            b = base + color
+        elif x == 3:
+            r = base
+            g = val - color
+            b = val
+        elif x == 4:
+            r = base + color
+            g = base
+            b = val
+        elif x == 5:
+            r = val
+            g = base
+            b = val - color
+        else:
+            r = 0
+            g = 0
+            b = 0
+
+    return int(r), int(g), int(b)
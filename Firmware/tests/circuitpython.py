@@ -0,0 +1,106 @@
+'''
+Host stand-ins for the CircuitPython modules the firmware imports, so its
+logic can be tested with CPython:
+
+    python -m unittest discover -s Firmware/tests -t Firmware/tests
+
+Importing this module puts Firmware/ and Firmware/lib/ on the path and
+installs a stand-in for every CircuitPython module that can't be imported.
+Time only moves through set_ticks() and advance().
+'''
+import os
+import sys
+import types
+
+FIRMWARE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (os.path.join(FIRMWARE, 'lib'), FIRMWARE):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+_ticks = [0]
+
+
+def set_ticks(ms):
+    _ticks[0] = ms
+
+
+def advance(ms):
+    _ticks[0] += ms
+
+
+def _ticks_ms():
+    return _ticks[0] & ((1 << 29) - 1)
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.value = True
+        self.direction = None
+        self.pull = None
+
+    def deinit(self):
+        pass
+
+
+class IncrementalEncoder:
+    '''Position is set by the test, as if counted in hardware.'''
+
+    def __init__(self, pin_a, pin_b, divisor=4):
+        self.divisor = divisor
+        self.position = 0
+
+
+class MidiPort:
+    '''Records what's written, reads what the test put in incoming.'''
+
+    def __init__(self):
+        self.written = bytearray()
+        self.incoming = bytearray()
+
+    def write(self, buf, num):
+        self.written.extend(buf[:num])
+        return num
+
+    def read(self, nbytes):
+        data = bytes(self.incoming[:nbytes])
+        del self.incoming[:nbytes]
+        return data
+
+
+def _neopixel_write(pin, buf):
+    # What was last shown, for tests to look at
+    pin.written = bytes(buf)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    return module
+
+
+_STAND_INS = {
+    'micropython': lambda: _module('micropython', const=lambda value: value),
+    'supervisor': lambda: _module('supervisor', ticks_ms=_ticks_ms, runtime=None),
+    'digitalio': lambda: _module(
+        'digitalio',
+        DigitalInOut=DigitalInOut,
+        Direction=types.SimpleNamespace(INPUT=0, OUTPUT=1),
+        Pull=types.SimpleNamespace(UP=1, DOWN=2),
+    ),
+    'rotaryio': lambda: _module('rotaryio', IncrementalEncoder=IncrementalEncoder),
+    'neopixel_write': lambda: _module('neopixel_write', neopixel_write=_neopixel_write),
+    'usb_midi': lambda: _module('usb_midi', ports=[MidiPort(), MidiPort()]),
+    'usb_hid': lambda: _module('usb_hid', devices=[]),
+    'storage': lambda: _module(
+        'storage', getmount=lambda path: types.SimpleNamespace(label='')
+    ),
+}
+
+for _name, _make in _STAND_INS.items():
+    try:
+        __import__(_name)
+    except ImportError:
+        sys.modules[_name] = _make()
@@ -0,0 +1,194 @@
+import types
+import unittest
+
+import circuitpython
+
+from kmk.hid import HIDModes
+from kmk.keys import KC
+from kmk.kmk_keyboard import KMKKeyboard
+from kmk.matrix import DiodeOrientation
+from kmk.modules.encoder import Encoder, EncoderHandler, RotaryioEncoder
+
+# Pin states (a << 1 | b) per poll, starting from the detent both pins high
+# rest on. Turning clockwise walks 3 -> 1 -> 0 -> 2 -> 3.
+CW = (1, 0, 2, 3)
+CCW = (2, 0, 1, 3)
+
+
+class TestEncoderTrace(unittest.TestCase):
+    def replay(self, trace, divisor=4):
+        encoder = Encoder('A', 'B', divisor=divisor)
+        moves = []
+        encoder.on_move_do = lambda state: moves.append(state.delta)
+        for state in trace:
+            encoder.pin_a.io.value = bool(state & 2)
+            encoder.pin_b.io.value = bool(state & 1)
+            encoder.update_state()
+        return encoder, moves
+
+    def test_fast_spin_cw(self):
+        encoder, moves = self.replay(CW * 40)
+        self.assertEqual(sum(moves), 40)
+        self.assertEqual(encoder._pos, 40)
+
+    def test_fast_spin_ccw(self):
+        encoder, moves = self.replay(CCW * 40)
+        self.assertEqual(sum(moves), -40)
+        self.assertEqual(encoder._pos, -40)
+
+    def test_direction_change(self):
+        encoder, moves = self.replay(CW * 5 + CCW * 3)
+        self.assertEqual(moves, [1] * 5 + [-1] * 3)
+
+    def test_missed_edge(self):
+        # Every other detent skips state 2: 0 -> 3 changes both pins
+        trace = (CW + (1, 0, 3)) * 10
+        encoder, moves = self.replay(trace)
+        self.assertEqual(sum(moves), 20)
+        self.assertEqual(encoder._illegal_transitions, 10)
+
+    def test_bounce(self):
+        # Contact bounce on the first edge before turning on
+        trace = (1, 3, 1, 3) + CW + (2, 3, 2) + (3, 1, 0, 2, 3)
+        encoder, moves = self.replay(trace)
+        self.assertEqual(sum(moves), 2)
+
+    def test_half_detent_back_and_forth(self):
+        encoder, moves = self.replay((1, 0, 1, 3) * 10)
+        self.assertEqual(moves, [])
+
+    def test_two_edges_per_detent(self):
+        # Encoders resting on both high and both low
+        encoder, moves = self.replay((1, 0, 2, 3) * 10, divisor=2)
+        self.assertEqual(sum(moves), 20)
+
+
+class TestRotaryioStall(unittest.TestCase):
+    '''
+    rotaryio keeps counting while the main loop is stalled, the next update
+    has to report every step at once.
+    '''
+
+    def test_stall_loses_no_steps(self):
+        encoder = RotaryioEncoder('A', 'B')
+        moves = []
+        encoder.on_move_do = lambda state: moves.append(state.delta)
+
+        position = 0
+        for stall in (1, 0, 5, 37, 0, -12, 3, -60, 100):
+            # The hardware counts during the stall, nobody polls
+            position += stall
+            encoder.encoder.position = position
+            encoder.update_state()
+
+        self.assertEqual(moves, [1, 5, 37, -12, 3, -60, 100])
+        self.assertEqual(encoder._pos, position)
+
+    def test_stall_through_handler(self):
+        # A key taking all detents at once gets them in a single call
+        steps = []
+        key = types.SimpleNamespace(
+            meta=types.SimpleNamespace(
+                on_encoder_move=lambda key, keyboard, count: steps.append(count)
+            )
+        )
+        keyboard = types.SimpleNamespace(active_layers=[0], debug_enabled=False)
+        handler = EncoderHandler()
+        handler.pins = (('A', 'B', None),)
+        handler.map = (((key, key, None),),)
+        handler.during_bootup(keyboard)
+        encoder = handler.encoders[0]
+        self.assertIsInstance(encoder, RotaryioEncoder)
+
+        encoder.encoder.position = 25
+        handler.before_matrix_scan(keyboard)
+        encoder.encoder.position = -3
+        handler.before_matrix_scan(keyboard)
+        handler.before_matrix_scan(keyboard)
+
+        self.assertEqual(steps, [25, -28])
+
+
+class IdleMatrix:
+    '''A matrix nobody presses keys on.'''
+
+    def __init__(self, cols, rows, diode_orientation=None, rollover_cols_every_rows=None):
+        pass
+
+    def scan_for_changes(self):
+        return None
+
+
+class TestTapRepeat(unittest.TestCase):
+    '''
+    Keys without on_encoder_move are tapped once per detent through the
+    main loop, a press and a release report for every detent.
+    '''
+
+    def setUp(self):
+        circuitpython.set_ticks(1000)
+        keyboard = KMKKeyboard()
+        keyboard._timeouts = {}
+        self.handler = EncoderHandler()
+        self.handler.pins = (('A', 'B', None),)
+        self.handler.map = (((KC.VOLD, KC.VOLU, None),),)
+        keyboard.modules = [self.handler]
+        keyboard.matrix_scanner = IdleMatrix
+        keyboard.col_pins = (None,)
+        keyboard.row_pins = (None,)
+        keyboard.diode_orientation = DiodeOrientation.COL2ROW
+        keyboard.keymap = [[KC.NO]]
+        keyboard._init(hid_type=HIDModes.NOOP)
+        self.keyboard = keyboard
+        self.counter = self.handler.encoders[0].encoder
+
+        self.reports = []
+        send_hid = keyboard._send_hid
+
+        def record():
+            self.reports.append(set(keyboard.keys_pressed))
+            send_hid()
+
+        keyboard._send_hid = record
+
+    def turn(self, detents, loops=1):
+        self.counter.position += detents
+        for _ in range(loops):
+            circuitpython.advance(1)
+            self.keyboard._main_loop()
+
+    def taps(self, key):
+        # Reports with the key pressed that follow one without it
+        taps = 0
+        pressed = False
+        for report in self.reports:
+            if key in report and not pressed:
+                taps += 1
+            pressed = key in report
+        return taps
+
+    def test_one_detent(self):
+        self.turn(1)
+        self.assertEqual(self.reports, [{KC.VOLU}, set()])
+
+    def test_detents_in_one_poll(self):
+        self.turn(5, loops=10)
+        self.assertEqual(self.taps(KC.VOLU), 5)
+        self.assertEqual(self.reports[-1], set())
+        self.assertEqual(self.handler._taps, [])
+
+    def test_direction_change_keeps_order(self):
+        self.turn(3)
+        self.turn(-2, loops=10)
+        sequence = [next(iter(report)) for report in self.reports if report]
+        self.assertEqual(sequence, [KC.VOLU] * 3 + [KC.VOLD] * 2)
+        self.assertEqual(self.reports[-1], set())
+
+    def test_accelerated(self):
+        self.handler.acceleration = ((1000, 4),)
+        self.turn(2, loops=20)
+        self.assertEqual(self.taps(KC.VOLU), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
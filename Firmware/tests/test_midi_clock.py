@@ -0,0 +1,173 @@
+import random
+import unittest
+
+import circuitpython
+
+from kmk.kmk_keyboard import KMKKeyboard
+from midi import Midi, MidiClock
+from supervisor import ticks_ms
+
+TIMING_CLOCK = 0xF8
+
+
+class RecordingMidi:
+    '''Takes the clock's output in place of adafruit_midi.MIDI.'''
+
+    def __init__(self):
+        self.sent = []
+
+    def send_realtime(self, status):
+        self.sent.append(status)
+
+
+def keyboard():
+    keyboard = KMKKeyboard()
+    # Timeouts are a class attribute, every test gets its own
+    keyboard._timeouts = {}
+    return keyboard
+
+
+class TestClockJitter(unittest.TestCase):
+    '''
+    Runs the clock through KMKKeyboard's timeouts with main loops of random
+    length. However long the loops, no tick may be lost or added, and none
+    may be sent later than one loop after it was due.
+    '''
+
+    def run_clock(self, bpm, max_loop_ms, seconds=10):
+        circuitpython.set_ticks(1000)
+        board = keyboard()
+        midi = RecordingMidi()
+        clock = MidiClock(midi, bpm)
+        clock.keyboard = board
+        clock.start()
+
+        loops = random.Random(bpm * 100 + max_loop_ms)
+        start = ticks_ms()
+        while ticks_ms() - start < seconds * 1000:
+            circuitpython.advance(loops.randint(1, max_loop_ms))
+            board._process_timeouts()
+        elapsed = ticks_ms() - start
+        clock.stop()
+        return clock, midi, elapsed
+
+    def test_jitter_bounds(self):
+        for bpm in (60, 120, 174, 300):
+            for max_loop_ms in (1, 5, 10, 20):
+                with self.subTest(bpm=bpm, max_loop_ms=max_loop_ms):
+                    clock, midi, elapsed = self.run_clock(bpm, max_loop_ms)
+
+                    # Tick k is due at k * period_us, rounded down to the ms
+                    due = ((elapsed + 1) * 1000 - 1) // clock._period_us + 1
+                    self.assertEqual(clock.ticks_sent, due)
+                    self.assertEqual(midi.sent.count(TIMING_CLOCK), due)
+                    self.assertLessEqual(clock.late_max, max_loop_ms)
+                    self.assertEqual(midi.sent[0], 0xFA)
+                    self.assertEqual(midi.sent[-1], 0xFC)
+
+    def test_stop_cancels_the_next_tick(self):
+        clock, midi, elapsed = self.run_clock(120, 5, seconds=1)
+        self.assertEqual(clock.keyboard._timeouts, {})
+
+
+class TestClockTap(unittest.TestCase):
+    def setUp(self):
+        circuitpython.set_ticks(1000)
+        self.clock = MidiClock(RecordingMidi())
+
+    def tap_every(self, interval, taps):
+        for _ in range(taps):
+            self.clock.tap()
+            circuitpython.advance(interval)
+
+    def test_tap_tempo(self):
+        self.tap_every(500, 4)
+        self.assertEqual(self.clock.bpm, 120)
+
+    def test_bounce_is_ignored(self):
+        self.clock.tap()
+        circuitpython.advance(5)
+        self.clock.tap()
+        circuitpython.advance(495)
+        self.clock.tap()
+        self.assertEqual(self.clock.bpm, 120)
+
+    def test_taps_in_the_same_ms(self):
+        self.clock.tap()
+        self.clock.tap()
+        self.clock.tap()
+        self.assertEqual(self.clock.bpm, 120)
+
+    def test_pause_starts_over(self):
+        self.tap_every(300, 4)
+        circuitpython.advance(3000)
+        self.tap_every(1000, 2)
+        self.assertEqual(self.clock.bpm, 60)
+
+
+class TestClockFollow(unittest.TestCase):
+    '''
+    Timing Clock coming in on port 0, read by the extension a few messages
+    per loop, like on the keyboard.
+    '''
+
+    def setUp(self):
+        circuitpython.set_ticks(1000)
+        self.board = keyboard()
+        self.midi = Midi(in_port=0, follow_clock=True)
+        self.midi.during_bootup(self.board)
+        self.port = self.midi.midi_in
+        self.port.incoming = bytearray()
+
+    def play(self, bpm, ms, loop_ms=1):
+        # Sends the clock at bpm for ms, read every loop_ms
+        period_us = 60000000 // (bpm * MidiClock.PPQN)
+        sent_us = 0
+        for _ in range(ms // loop_ms):
+            for _ in range(loop_ms):
+                circuitpython.advance(1)
+                sent_us += 1000
+                while sent_us >= period_us:
+                    self.port.incoming.append(TIMING_CLOCK)
+                    sent_us -= period_us
+            self.midi.before_matrix_scan(self.board)
+
+    def drain(self, loop_ms=0):
+        while self.port.incoming:
+            circuitpython.advance(loop_ms)
+            self.midi.before_matrix_scan(self.board)
+        # What was read but not handled yet
+        for _ in range(10):
+            self.midi.before_matrix_scan(self.board)
+
+    def test_follows_tempo(self):
+        for bpm in (60, 120, 174, 300):
+            with self.subTest(bpm=bpm):
+                self.setUp()
+                self.play(bpm, 4000)
+                self.assertAlmostEqual(self.midi.clock.bpm, bpm, delta=bpm / 50)
+
+    def test_follows_with_slow_loops(self):
+        self.play(120, 4000, loop_ms=15)
+        self.assertAlmostEqual(self.midi.clock.bpm, 120, delta=3)
+
+    def test_backlog_in_one_ms(self):
+        # Two and a half beats handled at once: no beat can be measured
+        self.port.incoming.extend(bytes([TIMING_CLOCK]) * 60)
+        self.drain()
+        self.assertEqual(self.midi.clock.bpm, 120)
+
+    def test_backlog_after_stall(self):
+        self.play(100, 3000)
+        # The main loop stalls for 600 ms while 24 ticks come in, then
+        # catches up eight messages per loop
+        self.port.incoming.extend(bytes([TIMING_CLOCK]) * 24)
+        circuitpython.advance(600)
+        self.drain(loop_ms=1)
+        self.play(100, 1000)
+
+        self.assertAlmostEqual(self.midi.clock.bpm, 100, delta=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
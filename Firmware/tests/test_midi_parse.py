@@ -0,0 +1,302 @@
+import random
+import unittest
+
+import circuitpython  # NOQA
+
+import adafruit_midi
+import baseline_midi
+from adafruit_midi import (  # NOQA, registers every message type
+    channel_pressure,
+    control_change,
+    midi_continue,
+    mtc_quarter_frame,
+    note_off,
+    note_on,
+    pitch_bend,
+    polyphonic_key_pressure,
+    program_change,
+    start,
+    stop,
+    system_exclusive,
+    timing_clock,
+)
+from adafruit_midi.midi_message import MIDIBadEvent, MIDIEvent, MIDIMessage, MIDIUnknownEvent
+
+# Clock, a chord, a CC sweep, SysEx longer than the input buffer, running
+# status data bytes and a status nobody registered
+RECORDED = bytes(
+    [0xFA, 0xF8, 0x90, 60, 100, 0xF8, 0x90, 64, 90, 0x90, 67, 80, 0xF8]
+    + [0xB0, 7, 0, 0xB0, 7, 32, 0xB0, 7, 64, 0xB0, 7, 127]
+    + [0xF0, 0x7D] + list(range(40)) + [0xF7]
+    + [0xF0, 0x7D, 1, 2, 3, 0xF7, 0xF0, 0x7E, 0xF7]
+    + [0xE0, 0, 64, 12, 34, 0xF4, 0xC1, 5, 0xA2, 60, 10, 0xD3, 99]
+    + [0x80, 60, 0, 0x80, 64, 0x90, 67, 0, 0xF8, 0xFC]
+)
+
+
+def random_stream(rng, messages=60):
+    data = bytearray()
+    for _ in range(messages):
+        kind = rng.random()
+        channel = rng.randrange(16)
+        if kind < 0.3:
+            status = rng.choice((0x80, 0x90, 0xA0, 0xB0, 0xE0)) | channel
+            data.extend((status, rng.randrange(128), rng.randrange(128)))
+        elif kind < 0.4:
+            data.extend((rng.choice((0xC0, 0xD0)) | channel, rng.randrange(128)))
+        elif kind < 0.55:
+            data.append(rng.choice((0xF8, 0xFA, 0xFB, 0xFC)))
+        elif kind < 0.7:
+            data.append(0xF0)
+            data.extend(rng.randrange(128) for _ in range(rng.randrange(45)))
+            if rng.random() < 0.9:
+                data.append(0xF7)
+        elif kind < 0.8:
+            # Stray data bytes, e.g. running status
+            data.extend(rng.randrange(128) for _ in range(rng.randint(1, 3)))
+        elif kind < 0.9:
+            # Statuses nobody registered
+            data.append(rng.choice((0xF2, 0xF3, 0xF4, 0xF5, 0xF6, 0xF9, 0xFD, 0xFE, 0xFF)))
+        else:
+            # Cut short by the next status, or a status in a data byte
+            if rng.random() < 0.8:
+                data.append(rng.choice((0x80, 0x90, 0xB0, 0xE0)) | channel)
+            else:
+                data.append(0xF1)
+            data.extend(rng.randrange(256) for _ in range(rng.randint(0, 2)))
+    return bytes(data)
+
+
+class ChunkedPort:
+    '''Hands out the stream in chunks of random size, like USB packets arrive.'''
+
+    def __init__(self, stream, seed):
+        self.stream = stream
+        self.pos = 0
+        self.chunks = random.Random(seed)
+
+    @property
+    def drained(self):
+        return self.pos == len(self.stream)
+
+    def read(self, nbytes):
+        num = min(nbytes, self.chunks.randint(1, 16), len(self.stream) - self.pos)
+        data = self.stream[self.pos : self.pos + num]
+        self.pos += num
+        return data
+
+
+def describe(msg):
+    # Everything a caller can see of a message
+    if isinstance(msg, MIDIUnknownEvent):
+        return ('unknown', msg.status)
+    if isinstance(msg, MIDIBadEvent):
+        return ('bad', msg.data, msg.exception_text)
+    return (type(msg).__name__, msg.channel, bytes(msg.__bytes__()))
+
+
+def receive_all(midi, port, buf_size):
+    received = []
+    # Bounded: a buffer full of stray data bytes in front of an incomplete
+    # message never makes room, in both parsers
+    for _ in range(4 * len(port.stream)):
+        if port.drained:
+            break
+        msg = midi.receive()
+        if msg is not None:
+            received.append(describe(msg))
+    # What's left in the input buffer comes out one message per call
+    for _ in range(2 * buf_size):
+        msg = midi.receive()
+        if msg is not None:
+            received.append(describe(msg))
+    return received
+
+
+def decode_all(stream, in_channel):
+    # Every message in a buffer holding the whole stream, by the table
+    received = []
+    start = 0
+    while start < len(stream):
+        msg, endplusone, skipped = MIDIMessage.from_message_bytes(stream, in_channel, start)
+        if msg is not None:
+            received.append(describe(msg))
+        elif endplusone == start:
+            # An incomplete message at the end
+            break
+        start = endplusone
+    return received
+
+
+def baseline_decode_all(stream, in_channel):
+    # The same by the linear scan, reslicing the buffer
+    received = []
+    while stream:
+        msg, endplusone, skipped = baseline_midi.from_message_bytes(stream, in_channel)
+        if msg is not None:
+            received.append(describe(msg))
+        elif endplusone == 0:
+            break
+        stream = stream[endplusone:]
+    return received
+
+
+class TestStatusTable(unittest.TestCase):
+    '''
+    The 256 entry status table has to classify like the linear scan of the
+    registered message types it replaced.
+    '''
+
+    def test_every_status(self):
+        for status in range(256):
+            with self.subTest(status=hex(status)):
+                scanned = baseline_midi.match_message_status(
+                    bytes((status, 0, 0, 0xF7)), 0, 0, 3
+                )
+                known = scanned[2]
+                msgclass = MIDIMessage._status_to_class[status]
+                self.assertEqual(msgclass, scanned[0] if known else None)
+                self.assertEqual(
+                    MIDIMessage._status_to_length[status], msgclass.LENGTH if known else 0
+                )
+
+    def test_recorded_stream(self):
+        for in_channel in (tuple(range(16)), 0, 1, (1, 3)):
+            with self.subTest(in_channel=in_channel):
+                received = decode_all(RECORDED, in_channel)
+                self.assertEqual(received, baseline_decode_all(RECORDED, in_channel))
+        kinds = set(msg[0] for msg in decode_all(RECORDED, tuple(range(16))))
+        self.assertTrue({'SystemExclusive', 'unknown', 'NoteOn', 'PitchBend'} <= kinds)
+
+    def test_random_streams(self):
+        for seed in range(300):
+            stream = random_stream(random.Random(seed))
+            with self.subTest(seed=seed):
+                self.assertEqual(
+                    decode_all(stream, tuple(range(16))),
+                    baseline_decode_all(stream, tuple(range(16))),
+                )
+
+
+class TestReceive(unittest.TestCase):
+    '''
+    The fixed input buffer has to give what reslicing the buffer after
+    every message gave, also when the stream comes in small chunks.
+    '''
+
+    def compare(self, stream, seed, buf_size=30, in_channel=None):
+        port = ChunkedPort(stream, seed)
+        expected = receive_all(
+            baseline_midi.MIDI(port, in_channel=in_channel, in_buf_size=buf_size), port, buf_size
+        )
+        port = ChunkedPort(stream, seed)
+        received = receive_all(
+            adafruit_midi.MIDI(midi_in=port, in_channel=in_channel, in_buf_size=buf_size),
+            port,
+            buf_size,
+        )
+        self.assertEqual(received, expected)
+        return received
+
+    def test_recorded_stream(self):
+        for buf_size in (30, 64):
+            with self.subTest(buf_size=buf_size):
+                received = self.compare(RECORDED, 0, buf_size)
+                self.assertIn('SystemExclusive', [msg[0] for msg in received])
+
+    def test_random_streams(self):
+        for seed in range(500):
+            rng = random.Random(seed)
+            with self.subTest(seed=seed):
+                self.compare(random_stream(rng), seed)
+
+    def test_random_streams_one_channel(self):
+        for seed in range(200):
+            rng = random.Random(seed)
+            with self.subTest(seed=seed):
+                self.compare(random_stream(rng), seed, in_channel=3)
+
+
+class BatchReceiver:
+    '''
+    Receives with receive_into() or, given a pool of event records, with
+    receive_events(), one message per receive() to compare.
+    '''
+
+    def __init__(self, midi, pool=None):
+        self.midi = midi
+        self.pool = pool
+        self.pending = []
+
+    def receive(self):
+        if not self.pending:
+            if self.pool is None:
+                self.midi.receive_into(self.pending, 4)
+            else:
+                count = self.midi.receive_events(self.pool)
+                self.pending = [event.to_message() for event in self.pool[:count]]
+        return self.pending.pop(0) if self.pending else None
+
+
+class EventReceiver:
+    '''Receives with receive_event(), turned into a message to compare.'''
+
+    def __init__(self, midi):
+        self.midi = midi
+        self.event = MIDIEvent()
+
+    def receive(self):
+        event = self.midi.receive_event(self.event)
+        return None if event is None else event.to_message()
+
+
+class TestReceiveEvent(unittest.TestCase):
+    '''
+    Event records have to give the messages the class path gives,
+    malformed ones and channel filtering included.
+    '''
+
+    def compare(self, stream, seed, in_channel=None):
+        def midi(port):
+            return adafruit_midi.MIDI(midi_in=port, in_channel=in_channel)
+
+        port = ChunkedPort(stream, seed)
+        expected = receive_all(midi(port), port, 30)
+        port = ChunkedPort(stream, seed)
+        received = receive_all(EventReceiver(midi(port)), port, 30)
+        self.assertEqual(received, expected)
+
+        # Batches read once for several messages, compared batch to batch
+        port = ChunkedPort(stream, seed)
+        expected_batches = receive_all(BatchReceiver(midi(port)), port, 30)
+        port = ChunkedPort(stream, seed)
+        pool = [MIDIEvent() for _ in range(4)]
+        received_batches = receive_all(BatchReceiver(midi(port), pool), port, 30)
+        self.assertEqual(received_batches, expected_batches)
+        return received
+
+    def test_recorded_stream(self):
+        self.compare(RECORDED, 0)
+
+    def test_malformed(self):
+        # A status byte in the LSB of a PitchBend is taken by the class,
+        # in its MSB or in a NoteOn it's bad
+        stream = bytes((0xE3, 0x80, 0x40, 0xE3, 0x00, 0xC0, 0x93, 60, 0x90, 0xF8))
+        received = self.compare(stream, 0)
+        # 0x40 << 7 | 0x80, sent back out as a proper LSB and MSB
+        self.assertEqual(received[0], ('PitchBend', 3, bytes((0xE3, 0x00, 0x41))))
+        self.assertEqual(received[1][:2], ('bad', bytes((0xE3, 0x00, 0xC0))))
+        self.assertEqual(received[2][:2], ('bad', bytes((0x93, 60, 0x90))))
+        self.assertIn('Out of range', received[2][2])
+        self.compare(stream, 0, in_channel=5)
+
+    def test_random_streams(self):
+        for seed in range(300):
+            stream = random_stream(random.Random(seed))
+            for in_channel in (None, 3):
+                with self.subTest(seed=seed, in_channel=in_channel):
+                    self.compare(stream, seed, in_channel)
+
+
+if __name__ == '__main__':
+    unittest.main()
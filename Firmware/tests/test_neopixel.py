@@ -0,0 +1,107 @@
+import random
+import unittest
+
+import circuitpython  # NOQA
+
+import neopixel
+from kmk.extensions.rgb import ColorProfile, ColorProfiles
+
+
+def pixels(n, order=neopixel.GRB, brightness=1.0, profile=None):
+    strip = neopixel.NeoPixel(
+        None, n, pixel_order=order, brightness=brightness, auto_write=False
+    )
+    if profile is not None:
+        strip.set_calibration(profile.tables())
+    return strip
+
+
+def expected_output(colors, order, brightness, tables):
+    # What goes out for colors given per pixel in R, G, B[, W], worked out
+    # one byte at a time like show() did before the lookup tables
+    bpp = len(order)
+    out = bytearray(len(colors) * bpp)
+    for index, color in enumerate(colors):
+        for channel, value in enumerate(color):
+            if tables is not None and channel < len(tables):
+                value = tables[channel][value]
+            if brightness <= 0.99:
+                value = int(value * brightness)
+            out[index * bpp + order[channel]] = value
+    return bytes(out)
+
+
+class TestCalibration(unittest.TestCase):
+    '''
+    show() and fill() with a color profile have to give the uncalibrated
+    output put through the profile's tables, and with the identity profile
+    exactly the uncalibrated output.
+    '''
+
+    def random_colors(self, rng, n, bpp):
+        return [tuple(rng.randrange(256) for _ in range(bpp)) for _ in range(n)]
+
+    def test_identity_tables(self):
+        self.assertEqual(ColorProfile().tables(), (bytes(range(256)),) * 3)
+
+    def test_identity_profile(self):
+        rng = random.Random(0)
+        for n in (4, 64, 300):
+            for brightness in (1.0, 0.5, 0.1):
+                with self.subTest(n=n, brightness=brightness):
+                    plain = pixels(n, brightness=brightness)
+                    identity = pixels(n, brightness=brightness, profile=ColorProfile())
+                    for strip in (plain, identity):
+                        strip.fill((10, 200, 30))
+                        strip.show()
+                    self.assertEqual(identity.pin.written, plain.pin.written)
+
+                    colors = self.random_colors(rng, n, 3)
+                    for strip in (plain, identity):
+                        strip.set_many(range(n), b''.join(bytes(c) for c in colors))
+                        strip.show()
+                    self.assertEqual(identity.pin.written, plain.pin.written)
+                    # Nothing to build, the buffer is written as is
+                    if brightness > 0.99:
+                        self.assertIsNone(identity._luts)
+
+    def test_profile(self):
+        rng = random.Random(1)
+        for profile in (ColorProfiles.GAMMA, ColorProfiles.WS2812):
+            tables = profile.tables()
+            for order in (neopixel.GRB, neopixel.RGB, neopixel.GRBW):
+                for brightness in (1.0, 0.25):
+                    with self.subTest(profile=profile.scale, order=order, brightness=brightness):
+                        strip = pixels(64, order, brightness, profile)
+                        bpp = len(order)
+                        color = tuple(rng.randrange(256) for _ in range(bpp))
+                        strip.fill(color)
+                        strip.show()
+                        self.assertEqual(
+                            strip.pin.written,
+                            expected_output([color] * 64, order, brightness, tables),
+                        )
+
+                        colors = self.random_colors(rng, 64, bpp)
+                        for index, color in enumerate(colors):
+                            strip[index] = color
+                        strip.show()
+                        self.assertEqual(
+                            strip.pin.written, expected_output(colors, order, brightness, tables)
+                        )
+
+    def test_profile_changed(self):
+        strip = pixels(8)
+        strip.fill((100, 150, 200))
+        strip.show()
+        uncalibrated = strip.pin.written
+        strip.set_calibration(ColorProfiles.WS2812.tables())
+        strip.show()
+        self.assertNotEqual(strip.pin.written, uncalibrated)
+        strip.set_calibration(None)
+        strip.show()
+        self.assertEqual(strip.pin.written, uncalibrated)
+
+
+if __name__ == '__main__':
+    unittest.main()
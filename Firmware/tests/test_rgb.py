@@ -0,0 +1,143 @@
+import types
+import unittest
+
+import circuitpython
+
+import baseline_rgb
+from kmk.extensions.rgb import RGB, AnimationModes, PowerTier
+
+
+def rgb(val_limit=100):
+    return RGB(pixel_pin=None, num_pixels=4, val_limit=val_limit)
+
+
+class TestHsvToRgb(unittest.TestCase):
+    '''
+    The table conversion has to give what the float conversion it replaced
+    gave, for every integer input and for anything else.
+    '''
+
+    def compare_grid(self, val_limit, vals):
+        ext = rgb(val_limit)
+        convert = ext.hsv_to_rgb
+        hues = range(360)
+        for sat in range(101):
+            for val in vals:
+                expected = [baseline_rgb.hsv_to_rgb(hue, sat, val, val_limit) for hue in hues]
+                received = [convert(hue, sat, val) for hue in hues]
+                if received != expected:
+                    hue = [i for i in hues if received[i] != expected[i]][0]
+                    self.fail(
+                        'hsv {} {} {} limit {}: {} != {}'.format(
+                            hue, sat, val, val_limit, received[hue], expected[hue]
+                        )
+                    )
+
+    def test_every_integer(self):
+        self.compare_grid(100, range(101))
+
+    def test_byte_vals(self):
+        self.compare_grid(255, range(101, 256, 5))
+
+    def test_val_limit(self):
+        self.compare_grid(37, range(0, 256, 9))
+        # Changed at runtime, e.g. by the breathing effect's users
+        ext = rgb(255)
+        ext.val_limit = 50
+        self.assertEqual(ext.hsv_to_rgb(0, 100, 200), (50, 0, 0))
+
+    def test_other_inputs(self):
+        ext = rgb(100)
+        inputs = (
+            (10.7, 50, 60),
+            (10.0, 50.0, 60.0),
+            (359.5, 100, 100),
+            (360, 50, 60),
+            (400, 50, 60),
+            (719, 50, 60),
+            (720, 50, 60),
+            (-5, 50, 60),
+            (-800, 50, 60),
+            (10, 50, -3),
+            (10, 50.5, 60),
+            (10, 0, 99.5),
+            (10, -5, 60),
+            (10, 150, 60),
+            (10, 50, 300),
+            (10, 50, 99.0),
+        )
+        for hue, sat, val in inputs:
+            with self.subTest(hsv=(hue, sat, val)):
+                self.assertEqual(
+                    ext.hsv_to_rgb(hue, sat, val), baseline_rgb.hsv_to_rgb(hue, sat, val, 100)
+                )
+
+    def test_rgbw(self):
+        ext = rgb(100)
+        self.assertEqual(ext.hsv_to_rgbw(200, 40, 90), ext.hsv_to_rgb(200, 40, 90) + (54,))
+
+
+class TestPowerTiers(unittest.TestCase):
+    '''
+    Stepping down and waking up through the power tiers, one main loop
+    every loop_ms.
+    '''
+
+    def setUp(self):
+        circuitpython.set_ticks(1000)
+        self.ext = RGB(
+            pixel_pin=None,
+            num_pixels=4,
+            animation_mode=AnimationModes.RAINBOW,
+            idle_timeouts=(1000, 5000, 20000),
+        )
+        self.sandbox = types.SimpleNamespace(matrix_update=None, secondary_matrix_update=None)
+
+    def run_loops(self, ms, loop_ms=1, key=False):
+        for _ in range(ms // loop_ms):
+            circuitpython.advance(loop_ms)
+            self.sandbox.matrix_update = bytearray(3) if key else None
+            self.ext.after_hid_send(self.sandbox)
+
+    def test_tiers(self):
+        self.run_loops(500)
+        self.assertEqual(self.ext.power_tier, PowerTier.ACTIVE)
+        self.run_loops(1000)
+        self.assertEqual(self.ext.power_tier, PowerTier.SLOW)
+        self.run_loops(4000)
+        self.assertEqual(self.ext.power_tier, PowerTier.DIM)
+        self.run_loops(15000)
+        self.assertEqual(self.ext.power_tier, PowerTier.OFF)
+        self.run_loops(1, key=True)
+        self.assertEqual(self.ext.power_tier, PowerTier.ACTIVE)
+
+    def test_no_frames_skipped_over_tier_changes(self):
+        for idle_ms in (3000, 10000, 60000):
+            with self.subTest(idle_ms=idle_ms):
+                self.setUp()
+                self.run_loops(idle_ms)
+                self.run_loops(1, key=True)
+                self.run_loops(1000)
+                self.assertEqual(self.ext.frames_skipped, 0)
+
+    def test_slow_tier_frame_rate(self):
+        self.run_loops(1000)
+        rendered = self.ext.frames_rendered
+        self.run_loops(3000)
+        # idle_refresh_rate is 10 per second
+        self.assertAlmostEqual(self.ext.frames_rendered - rendered, 30, delta=1)
+        self.assertEqual(self.ext.frames_skipped, 0)
+
+    def test_tier_time(self):
+        self.run_loops(3000)
+        # The time in the tier it's in counts up to now
+        self.assertEqual(self.ext.tier_time_ms, [1000, 2000, 0, 0])
+        self.run_loops(30000, loop_ms=10)
+        self.run_loops(10, loop_ms=10, key=True)
+        self.run_loops(500)
+        self.assertEqual(self.ext.tier_time_ms, [1500, 4000, 15000, 13010])
+        self.assertEqual(sum(self.ext.tier_time_ms), 33510)
+
+
+if __name__ == '__main__':
+    unittest.main()
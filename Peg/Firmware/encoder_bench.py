@@ -0,0 +1,124 @@
+'''
+Encoder benchmark, run on the keyboard from the REPL:
+
+    import encoder_bench
+    encoder_bench.run()
+
+Turns a GPIO encoder fed from stand-in pins by 1000 detents through
+EncoderHandler and prints the time and the bytes allocated per 1000 detents
+as one line of JSON. The handler's on_move_do only counts, as main.py's
+only records the time of the move, so the numbers are the encoder's own and
+not those of sending keys.
+
+Allocations are counted with gc.mem_alloc(), which CPython doesn't have,
+alloc_bytes is null there.
+'''
+import gc
+import json
+import sys
+import time
+
+from kmk.modules.encoder import BaseEncoder, EncoderHandler, GPIOEncoder
+
+# Pin states (a << 1 | b) of one detent clockwise, from both pins high
+_CW = (1, 0, 2, 3)
+
+
+class StubPin:
+    def __init__(self):
+        self.value = True
+
+    def get_value(self):
+        return self.value
+
+
+class ScriptedEncoder(GPIOEncoder):
+    def __init__(self, divisor=4):
+        BaseEncoder.__init__(self)
+        self.divisor = divisor
+        self.pin_a = StubPin()
+        self.pin_b = StubPin()
+        self.pin_button = None
+        self._state = 3
+        self._start_state = 3
+
+    def turn(self, detents):
+        pin_a = self.pin_a
+        pin_b = self.pin_b
+        for _ in range(detents):
+            for state in _CW:
+                pin_a.value = state >> 1
+                pin_b.value = state & 1
+                self.update_state()
+
+
+class _Keyboard:
+    active_layers = [0]
+
+
+def _handler():
+    moves = [0]
+
+    def on_move_do(keyboard, encoder_id, state):
+        moves[0] += state.direction
+
+    handler = EncoderHandler()
+    handler._keyboard = _Keyboard()
+    handler.on_move_do = on_move_do
+    encoder = ScriptedEncoder()
+    encoder.encoder_state.encoder_id = 0
+    encoder.on_move_do = handler._on_move
+    handler.encoders.append(encoder)
+    return encoder, moves
+
+
+def _allocated(func):
+    mem_alloc = getattr(gc, 'mem_alloc', None)
+    if mem_alloc is None:
+        func()
+        return None
+    gc.collect()
+    gc.disable()
+    try:
+        before = mem_alloc()
+        func()
+        return mem_alloc() - before
+    finally:
+        gc.enable()
+
+
+def _report(result):
+    print(json.dumps(result))
+    return result
+
+
+def run(detents=1000):
+    '''
+    Runs the benchmark and returns the results, which are also printed as
+    one JSON object per line.
+    '''
+    encoder, moves = _handler()
+    # Warm up, the first detent creates what's reused afterwards
+    encoder.turn(4)
+    moves[0] = 0
+
+    start = time.monotonic_ns()
+    encoder.turn(detents)
+    elapsed_ns = time.monotonic_ns() - start
+    steps = moves[0]
+    alloc = _allocated(lambda: encoder.turn(detents))
+
+    return [
+        _report({
+            'bench': 'meta',
+            'platform': sys.platform,
+            'implementation': sys.implementation.name,
+        }),
+        _report({
+            'bench': 'encoder.gpio',
+            'detents': detents,
+            'steps_seen': steps,
+            'alloc_bytes': alloc,
+            'us_per_detent': elapsed_ns / detents / 1000,
+        }),
+    ]
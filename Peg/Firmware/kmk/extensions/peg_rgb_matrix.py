@@ -24,6 +24,34 @@ class Color:
     PINK = [255, 0, 255]
 
 
+class ColorProfile:
+    '''
+    Output calibration: gamma and scale (white balance) per R, G and B
+    channel, turned into lookup tables the pixel frame is built through.
+    :param gamma: exponent, or (r, g, b) exponents
+    :param scale: (r, g, b) factors applied after gamma, 0.0-1.0
+    '''
+
+    def __init__(self, gamma=1.0, scale=(1.0, 1.0, 1.0)):
+        if not isinstance(gamma, (tuple, list)):
+            gamma = (gamma, gamma, gamma)
+        self.gamma = gamma
+        self.scale = scale
+
+    def tables(self):
+        return tuple(
+            bytes(int(((i / 255) ** gamma) * 255 * scale + 0.5) for i in range(256))
+            for gamma, scale in zip(self.gamma, self.scale)
+        )
+
+
+class ColorProfiles:
+    LINEAR = None
+    GAMMA = ColorProfile(gamma=2.2)
+    # Common WS2812 5050 white point, green and blue run hot
+    WS2812 = ColorProfile(gamma=2.2, scale=(1.0, 0.69, 0.94))
+
+
 class Rgb_matrix_data:
     def __init__(self, keys=[], underglow=[]):
         if len(keys) == 0:
@@ -51,12 +79,14 @@ class Rgb_matrix(Extension):
         ledDisplay=[],
         split=False,
         rightSide=False,
+        color_profile=ColorProfiles.LINEAR,
     ):
         name = str(getmount('/').label)
         self.rgb_order = rgb_order
         self.disable_auto_write = disable_auto_write
         self.split = split
         self.rightSide = rightSide
+        self.color_profile = color_profile
         self.brightness_step = 0.1
         self.brightness = 0
 
@@ -95,7 +125,6 @@ class Rgb_matrix(Extension):
     def on(self):
         if self.neopixel:
             self.setBasedOffDisplay()
-            self.neopixel.show()
 
     def off(self):
         if self.neopixel:
@@ -135,22 +164,39 @@ class Rgb_matrix(Extension):
         )
         self.set_brightness(self.brightness)
 
-    def setBasedOffDisplay(self):
-        if self.split:
-            for i, val in enumerate(self.ledDisplay):
-                if self.rightSide:
-                    if self.keyPos[i] >= (self.num_pixels / 2):
-                        self.neopixel[int(self.keyPos[i] - (self.num_pixels / 2))] = (
-                            val[0],
-                            val[1],
-                            val[2],
-                        )
-                else:
-                    if self.keyPos[i] <= (self.num_pixels / 2):
-                        self.neopixel[self.keyPos[i]] = (val[0], val[1], val[2])
+    def _compile_display(self):
+        '''
+        Builds the colors of this side's pixels from ledDisplay and keyPos as
+        one flat buffer of color components, in pixel index order. Done once,
+        redraws just copy it into the pixel buffer.
+        '''
+        bpp = len(self.rgb_order)
+        frame = bytearray(self.num_pixels * bpp)
+        num_pixels = self.num_pixels
+        if self.color_profile is None:
+            lut_r = lut_g = lut_b = range(256)
         else:
-            for i, val in enumerate(self.ledDisplay):
-                self.neopixel[self.keyPos[i]] = (val[0], val[1], val[2])
+            lut_r, lut_g, lut_b = self.color_profile.tables()
+        for pos, val in zip(self.keyPos, self.ledDisplay):
+            # Each half of a split drives its own strip, the right one
+            # starting at the middle of the combined key positions.
+            if self.split:
+                if self.rightSide:
+                    if pos * 2 < num_pixels:
+                        continue
+                    pos = (pos * 2 - num_pixels) // 2
+                elif pos * 2 > num_pixels:
+                    continue
+            offset = pos * bpp
+            frame[offset] = lut_r[val[0]]
+            frame[offset + 1] = lut_g[val[1]]
+            frame[offset + 2] = lut_b[val[2]]
+        self._frame = frame
+
+    def setBasedOffDisplay(self):
+        self.neopixel[:] = self._frame
+        if self.disable_auto_write:
+            self.neopixel.show()
 
     def on_runtime_enable(self, sandbox):
         return
@@ -169,6 +215,7 @@ class Rgb_matrix(Extension):
         self.num_pixels = board.num_pixels
         self.keyPos = board.led_key_pos
         self.brightness = board.brightness_limit
+        self._compile_display()
         self.on()
         return
 
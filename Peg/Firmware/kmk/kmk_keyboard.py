@@ -6,20 +6,20 @@ except ImportError:
 from supervisor import ticks_ms
 
 from collections import namedtuple
-from keypad import Event as KeyEvent
 
 from kmk.consts import UnicodeMode
 from kmk.hid import BLEHID, USBHID, AbstractHID, HIDModes
 from kmk.keys import KC, Key
 from kmk.kmktime import ticks_add, ticks_diff
 from kmk.modules import Module
+from kmk.scanners import KeyEvent, KeyEventQueue
 from kmk.scanners.keypad import MatrixScanner
 from kmk.utils import Debug
 
 debug = Debug(__name__)
 
 KeyBufferFrame = namedtuple(
-    'KeyBufferFrame', ('key', 'is_pressed', 'int_coord', 'index')
+    'KeyBufferFrame', ('key', 'is_pressed', 'int_coord', 'index', 'timestamp')
 )
 
 
@@ -39,6 +39,7 @@ class KMKKeyboard:
     col_pins = None
     diode_orientation = None
     matrix = None
+    max_events = 64
 
     unicode_mode = UnicodeMode.NOOP
 
@@ -58,6 +59,8 @@ class KMKKeyboard:
     matrix_update = None
     secondary_matrix_update = None
     matrix_update_queue = []
+    key_events = None
+    key_timestamp = None
     state_changed = False
     _trigger_powersave_enable = False
     _trigger_powersave_disable = False
@@ -163,7 +166,7 @@ class KMKKeyboard:
         if debug.enabled:
             debug(f'KeyResolution(key={key})')
 
-        self.pre_process_key(key, is_pressed, int_coord)
+        self.pre_process_key(key, is_pressed, int_coord, timestamp=kevent.timestamp)
 
     def _process_resume_buffer(self):
         '''
@@ -191,7 +194,9 @@ class KMKKeyboard:
 
             # Resume the processing of the key event and update the HID report
             # when applicable.
-            self.pre_process_key(key, ksf.is_pressed, ksf.int_coord, ksf.index)
+            self.pre_process_key(
+                key, ksf.is_pressed, ksf.int_coord, ksf.index, ksf.timestamp
+            )
 
             if self.hid_pending:
                 self._send_hid()
@@ -220,7 +225,12 @@ class KMKKeyboard:
         is_pressed: bool,
         int_coord: Optional[int] = None,
         index: int = 0,
+        timestamp: Optional[int] = None,
     ) -> None:
+        # Modules base their timeouts on `key_timestamp`, i.e. on when the key
+        # event actually happened rather than when we got around to it.
+        self.key_timestamp = timestamp
+
         for module in self.modules[index:]:
             try:
                 key = module.process_key(self, key, is_pressed, int_coord)
@@ -243,6 +253,8 @@ class KMKKeyboard:
         if key:
             self.process_key(key, is_pressed, int_coord)
 
+        self.key_timestamp = None
+
     def process_key(
         self, key: Key, is_pressed: bool, coord_int: Optional[int] = None
     ) -> None:
@@ -257,10 +269,15 @@ class KMKKeyboard:
         key: Key,
         is_pressed: bool,
         int_coord: Optional[int] = None,
+        timestamp: Optional[int] = None,
     ) -> None:
         index = self.modules.index(module) + 1
         ksf = KeyBufferFrame(
-            key=key, is_pressed=is_pressed, int_coord=int_coord, index=index
+            key=key,
+            is_pressed=is_pressed,
+            int_coord=int_coord,
+            index=index,
+            timestamp=timestamp,
         )
         self._resume_buffer.append(ksf)
 
@@ -278,7 +295,10 @@ class KMKKeyboard:
         self.set_timeout(False, lambda: self.remove_key(keycode))
 
     def set_timeout(
-        self, after_ticks: int, callback: Callable[[None], None]
+        self,
+        after_ticks: int,
+        callback: Callable[[None], None],
+        start: Optional[int] = None,
     ) -> Tuple[int, int]:
         # We allow passing False as an implicit "run this on the next process timeouts cycle"
         if after_ticks is False:
@@ -287,7 +307,12 @@ class KMKKeyboard:
         if after_ticks == 0 and self._processing_timeouts:
             after_ticks += 1
 
-        timeout_key = ticks_add(ticks_ms(), after_ticks)
+        # `start` lets callers count from an earlier point in time, i.e. the
+        # timestamp of a key event, instead of now.
+        if start is None:
+            start = ticks_ms()
+
+        timeout_key = ticks_add(start, after_ticks)
 
         if timeout_key not in self._timeouts:
             self._timeouts[timeout_key] = []
@@ -394,6 +419,8 @@ class KMKKeyboard:
         except TypeError:
             self.matrix = (self.matrix,)
 
+        self.key_events = KeyEventQueue(self.max_events)
+
     def before_matrix_scan(self) -> None:
         for module in self.modules:
             try:
@@ -529,11 +556,13 @@ class KMKKeyboard:
 
         self._process_resume_buffer()
 
+        # Drain all scanners into the shared event queue, but only hand out
+        # the next event once the previous ones have been handled: queue
+        # entries are reused.
         for matrix in self.matrix:
-            update = matrix.scan_for_changes()
-            if update:
-                self.matrix_update = update
-                break
+            matrix.scan_into(self.key_events)
+        if not self.matrix_update_queue:
+            self.matrix_update = self.key_events.get()
         self.sandbox.matrix_update = self.matrix_update
         self.sandbox.secondary_matrix_update = self.secondary_matrix_update
 
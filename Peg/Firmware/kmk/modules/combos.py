@@ -153,14 +153,16 @@ class Combos(Module):
             if combo._timeout:
                 keyboard.cancel_timeout(combo._timeout)
             combo._timeout = keyboard.set_timeout(
-                combo.timeout, lambda c=combo: self.reset_combo(keyboard, c)
+                combo.timeout,
+                lambda c=combo: self.reset_combo(keyboard, c),
+                start=keyboard.key_timestamp,
             )
 
         match_count = self.count_matching()
 
         if match_count:
             # At least one combo matches current key: append key to buffer.
-            self._key_buffer.append((int_coord, key, True))
+            self._key_buffer.append((int_coord, key, True, keyboard.key_timestamp))
             key = None
 
             for first_match in self.combos:
@@ -187,12 +189,14 @@ class Combos(Module):
                     else:
                         continue
                 combo._timeout = keyboard.set_timeout(
-                    combo.timeout, lambda c=combo: self.on_timeout(keyboard, c)
+                    combo.timeout,
+                    lambda c=combo: self.on_timeout(keyboard, c),
+                    start=keyboard.key_timestamp,
                 )
         else:
             # There's no matching combo: send and reset key buffer
             if self._key_buffer:
-                self._key_buffer.append((int_coord, key, True))
+                self._key_buffer.append((int_coord, key, True, keyboard.key_timestamp))
                 self.send_key_buffer(keyboard)
                 self._key_buffer = []
                 key = None
@@ -252,7 +256,7 @@ class Combos(Module):
                 elif len(combo._remaining) == len(combo.match) - 1:
                     self.reset_combo(keyboard, combo)
                     if not self.count_matching():
-                        self._key_buffer.append((int_coord, key, False))
+                        self._key_buffer.append((int_coord, key, False, keyboard.key_timestamp))
                         self.send_key_buffer(keyboard)
                         self._key_buffer = []
                         key = None
@@ -264,10 +268,15 @@ class Combos(Module):
             # Don't propagate key-release events for keys that have been
             # buffered. Append release events only if corresponding press is in
             # buffer.
-            pressed = self._key_buffer.count((int_coord, key, True))
-            released = self._key_buffer.count((int_coord, key, False))
+            pressed = released = 0
+            for (buffered_coord, buffered_key, is_pressed, _) in self._key_buffer:
+                if buffered_coord == int_coord and buffered_key == key:
+                    if is_pressed:
+                        pressed += 1
+                    else:
+                        released += 1
             if (pressed - released) > 0:
-                self._key_buffer.append((int_coord, key, False))
+                self._key_buffer.append((int_coord, key, False, keyboard.key_timestamp))
                 key = None
 
         # Reset on non-combo key up
@@ -297,8 +306,10 @@ class Combos(Module):
             self.reset_combo(keyboard, combo)
 
     def send_key_buffer(self, keyboard):
-        for (int_coord, key, is_pressed) in self._key_buffer:
-            keyboard.resume_process_key(self, key, is_pressed, int_coord)
+        # Buffered events keep their timestamps, so timeouts of later
+        # modules still count from the actual key event
+        for (int_coord, key, is_pressed, timestamp) in self._key_buffer:
+            keyboard.resume_process_key(self, key, is_pressed, int_coord, timestamp)
 
     def activate(self, keyboard, combo):
         combo.result.on_press(keyboard)
@@ -9,6 +9,28 @@ from kmk.modules import Module
 # NB : not using rotaryio as it requires the pins to be consecutive
 
 
+class EncoderState:
+    '''
+    Encoder state handed to the callbacks. Each encoder reuses a single
+    instance that is updated in place, copy the values if you need them after
+    the callback returned. Item access (`state['direction']`) is kept for
+    callbacks written against the former dict.
+    '''
+
+    def __init__(self):
+        self.encoder_id = None
+        self.direction = 0
+        self.position = 0
+        self.delta = 0
+        self.is_pressed = False
+        self.velocity = 0
+        # I2C encoders only
+        self.is_held = None
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
 class BaseEncoder:
 
     VELOCITY_MODE = True
@@ -20,7 +42,7 @@ class BaseEncoder:
 
         self._state = None
         self._start_state = None
-        self._direction = None
+        self._direction = 0
         self._pos = 0
         self._button_state = True
         self._button_held = None
@@ -29,23 +51,29 @@ class BaseEncoder:
         self._movement = 0
         self._timestamp = ticks_ms()
 
+        self.encoder_state = EncoderState()
+
         # callback functions on events. Need to be defined externally
         self.on_move_do = None
         self.on_button_do = None
 
     def get_state(self):
-        return {
-            'direction': self.is_inverted and -self._direction or self._direction,
-            'position': self.is_inverted and -self._pos or self._pos,
-            'is_pressed': not self._button_state,
-            'velocity': self._velocity,
-        }
-
-        # Called in a loop to refresh encoder state
+        state = self.encoder_state
+        if self.is_inverted:
+            state.direction = -self._direction
+            state.position = -self._pos
+        else:
+            state.direction = self._direction
+            state.position = self._pos
+        state.is_pressed = not self._button_state
+        state.velocity = self._velocity
+        return state
 
+    # Called in a loop to refresh encoder state
     def update_state(self):
-        # Rotation events
-        new_state = (self.pin_a.get_value(), self.pin_b.get_value())
+        # Rotation events, the pins packed as (a << 1 | b) so polling doesn't
+        # build a tuple
+        new_state = self.pin_a.get_value() << 1 | self.pin_b.get_value()
 
         if new_state != self._state:
             # encoder moved
@@ -53,21 +81,17 @@ class BaseEncoder:
             # false / false and true / true are common half steps
             # looking on the step just before helps determining
             # the direction
-            if new_state[0] == new_state[1] and self._state[0] != self._state[1]:
-                if new_state[1] == self._state[0]:
+            if new_state in (0, 3) and self._state in (1, 2):
+                if new_state & 1 == self._state >> 1:
                     self._direction = 1
                 else:
                     self._direction = -1
 
             # when the encoder settles on a position (every 2 steps)
-            if new_state[0] == new_state[1]:
+            if new_state in (0, 3):
                 # an encoder returned to the previous
                 # position halfway, cancel rotation
-                if (
-                    self._start_state[0] == new_state[0]
-                    and self._start_state[1] == new_state[1]
-                    and self._movement <= 2
-                ):
+                if self._start_state == new_state and self._movement <= 2:
                     self._movement = 0
                     self._direction = 0
 
@@ -125,7 +149,7 @@ class GPIOEncoder(BaseEncoder):
             EncoderPin(pin_button, button_type=True) if pin_button is not None else None
         )
 
-        self._state = (self.pin_a.get_value(), self.pin_b.get_value())
+        self._state = self.pin_a.get_value() << 1 | self.pin_b.get_value()
         self._start_state = self._state
 
     def button_event(self):
@@ -216,18 +240,22 @@ class I2CEncoder(BaseEncoder):
             self._button_held = False
 
     def get_state(self):
-        return {
-            'direction': self.is_inverted and -self._direction or self._direction,
-            'position': self._state,
-            'is_pressed': not self.switch.value,
-            'is_held': self._button_held,
-            'velocity': self._velocity,
-        }
+        state = self.encoder_state
+        if self.is_inverted:
+            state.direction = -self._direction
+        else:
+            state.direction = self._direction
+        state.position = self._state
+        state.is_pressed = not self.switch.value
+        state.is_held = self._button_held
+        state.velocity = self._velocity
+        return state
 
 
 class EncoderHandler(Module):
     def __init__(self):
         self.encoders = []
+        self._keyboard = None
         self.pins = None
         self.map = None
         self.divisor = 4
@@ -239,6 +267,7 @@ class EncoderHandler(Module):
         return
 
     def during_bootup(self, keyboard):
+        self._keyboard = keyboard
         if self.pins and self.map:
             for idx, pins in enumerate(self.pins):
                 try:
@@ -253,25 +282,26 @@ class EncoderHandler(Module):
                         if new_encoder.divisor is None:
                             new_encoder.divisor = self.divisor
 
-                    # In our case, we need to define keybord and encoder_id for callbacks
-                    new_encoder.on_move_do = lambda x, bound_idx=idx: self.on_move_do(
-                        keyboard, bound_idx, x
-                    )
-                    new_encoder.on_button_do = (
-                        lambda x, bound_idx=idx: self.on_button_do(
-                            keyboard, bound_idx, x
-                        )
-                    )
+                    # The encoder_id travels with the state, no need to bind it
+                    new_encoder.encoder_state.encoder_id = idx
+                    new_encoder.on_move_do = self._on_move
+                    new_encoder.on_button_do = self._on_button
                     self.encoders.append(new_encoder)
                 except Exception as e:
                     print(e)
         return
 
+    def _on_move(self, state):
+        self.on_move_do(self._keyboard, state.encoder_id, state)
+
+    def _on_button(self, state):
+        self.on_button_do(self._keyboard, state.encoder_id, state)
+
     def on_move_do(self, keyboard, encoder_id, state):
         if self.map:
             layer_id = keyboard.active_layers[0]
             # if Left, key index 0 else key index 1
-            if state['direction'] == -1:
+            if state.direction == -1:
                 key_index = 0
             else:
                 key_index = 1
@@ -279,7 +309,7 @@ class EncoderHandler(Module):
             keyboard.tap_key(key)
 
     def on_button_do(self, keyboard, encoder_id, state):
-        if state['is_pressed'] is True:
+        if state.is_pressed is True:
             layer_id = keyboard.active_layers[0]
             key = self.map[layer_id][encoder_id][2]
             keyboard.tap_key(key)
@@ -107,12 +107,16 @@ class HoldTap(Module):
         # apply changes with 'side-effects' on key_states or the loop behaviour
         # outside the loop.
         if append_buffer:
-            self.key_buffer.append((int_coord, current_key, is_pressed))
+            self.key_buffer.append(
+                (int_coord, current_key, is_pressed, keyboard.key_timestamp)
+            )
             current_key = None
 
         elif send_buffer:
             self.send_key_buffer(keyboard)
-            keyboard.resume_process_key(self, current_key, is_pressed, int_coord)
+            keyboard.resume_process_key(
+                self, current_key, is_pressed, int_coord, keyboard.key_timestamp
+            )
             current_key = None
 
         return current_key
@@ -151,6 +155,7 @@ class HoldTap(Module):
         timeout_key = keyboard.set_timeout(
             tap_time,
             lambda: self.on_tap_time_expired(key, keyboard, *args, **kwargs),
+            start=keyboard.key_timestamp,
         )
         self.key_states[key] = HoldTapKeyState(timeout_key, *args, **kwargs)
         return keyboard
@@ -191,7 +196,9 @@ class HoldTap(Module):
             else:
                 tap_time = key.meta.tap_time
             state.timeout_key = keyboard.set_timeout(
-                tap_time, lambda: self.key_states.pop(key)
+                tap_time,
+                lambda: self.key_states.pop(key),
+                start=keyboard.key_timestamp,
             )
         else:
             del self.key_states[key]
@@ -221,8 +228,10 @@ class HoldTap(Module):
         if not self.key_buffer:
             return
 
-        for (int_coord, key, is_pressed) in self.key_buffer:
-            keyboard.resume_process_key(self, key, is_pressed, int_coord)
+        # Buffered events keep their timestamps, so timeouts of later
+        # modules still count from the actual key event
+        for (int_coord, key, is_pressed, timestamp) in self.key_buffer:
+            keyboard.resume_process_key(self, key, is_pressed, int_coord, timestamp)
 
         self.key_buffer.clear()
 
@@ -31,7 +31,9 @@ class OneShot(HoldTap):
             elif state.activated == ActivationType.INTERRUPTED:
                 if is_pressed:
                     keyboard.remove_key(key.meta.tap)
-                    self.key_buffer.append((int_coord, current_key, is_pressed))
+                    self.key_buffer.append(
+                        (int_coord, current_key, is_pressed, keyboard.key_timestamp)
+                    )
                     keyboard.set_timeout(False, lambda: self.send_key_buffer(keyboard))
                     current_key = None
                 else:
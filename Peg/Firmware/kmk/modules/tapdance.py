@@ -50,7 +50,9 @@ class TapDance(HoldTap):
                 self.ht_activate_tap(_key, keyboard)
                 self.send_key_buffer(keyboard)
                 self.ht_deactivate_tap(_key, keyboard)
-                keyboard.resume_process_key(self, key, is_pressed, int_coord)
+                keyboard.resume_process_key(
+                    self, key, is_pressed, int_coord, keyboard.key_timestamp
+                )
                 key = None
 
                 del self.key_states[_key]
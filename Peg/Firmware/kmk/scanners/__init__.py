@@ -17,6 +17,75 @@ class DiodeOrientation:
     ROW2COL = ROWS
 
 
+class KeyEvent:
+    '''
+    Mutable stand-in for `keypad.Event`.
+
+    Instances live in a `KeyEventQueue` and are overwritten in place once the
+    queue wraps around, copy the fields if you need them for longer than the
+    current cycle.
+    '''
+
+    def __init__(self, key_number=0, pressed=True, timestamp=0):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return (
+            f'KeyEvent(key_number={self.key_number}, '
+            f'pressed={self.pressed}, timestamp={self.timestamp})'
+        )
+
+    @property
+    def released(self):
+        return not self.pressed
+
+
+class KeyEventQueue:
+    '''
+    Fixed size FIFO of preallocated `KeyEvent`s shared by all scanners of a
+    keyboard.
+    '''
+
+    def __init__(self, max_events=64):
+        self._events = tuple(KeyEvent() for _ in range(max_events))
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def full(self):
+        return self._count >= len(self._events)
+
+    def put(self, key_number, pressed, timestamp):
+        '''
+        Append an event, return False if the queue is full.
+        '''
+        if self._count >= len(self._events):
+            return False
+
+        ev = self._events[(self._head + self._count) % len(self._events)]
+        ev.key_number = key_number
+        ev.pressed = pressed
+        ev.timestamp = timestamp
+        self._count += 1
+        return True
+
+    def get(self):
+        '''
+        Pop the oldest event, or return None if the queue is empty.
+        '''
+        if not self._count:
+            return None
+
+        ev = self._events[self._head]
+        self._head = (self._head + 1) % len(self._events)
+        self._count -= 1
+        return ev
+
+
 class Scanner:
     '''
     Base class for scanners.
@@ -40,3 +109,21 @@ class Scanner:
         The key report is a byte array with contents [row, col, True if pressed else False]
         '''
         raise NotImplementedError
+
+    def scan_into(self, queue):
+        '''
+        Move pending key events into the shared `KeyEventQueue` and return the
+        number of events moved.
+
+        The default implementation moves at most one event per call, as
+        returned by `scan_for_changes`.
+        '''
+        if queue.full():
+            return 0
+
+        ev = self.scan_for_changes()
+        if ev is None:
+            return 0
+
+        queue.put(ev.key_number, ev.pressed, ev.timestamp)
+        return 1
@@ -1,6 +1,6 @@
 import keypad
 
-from kmk.scanners import DiodeOrientation, Scanner
+from kmk.scanners import DiodeOrientation, KeyEvent, Scanner
 
 
 class KeypadScanner(Scanner):
@@ -11,6 +11,13 @@ class KeypadScanner(Scanner):
     :param kp: An instance of the keypad class.
     '''
 
+    def __init__(self):
+        self.curr_event = keypad.Event()
+        # keypad.Event is read-only, events with an offset applied are
+        # reported through this one instead
+        self.curr_report = KeyEvent()
+        self.overflow_count = 0
+
     @property
     def key_count(self):
         return self.keypad.key_count
@@ -21,11 +28,39 @@ class KeypadScanner(Scanner):
 
         The key report is a byte array with contents [row, col, True if pressed else False]
         '''
-        ev = self.keypad.events.get()
-        if ev and self.offset:
-            return keypad.Event(ev.key_number + self.offset, ev.pressed)
+        ev = self.curr_event
+        if not self.keypad.events.get_into(ev):
+            return None
+        if self.offset:
+            report = self.curr_report
+            report.key_number = ev.key_number + self.offset
+            report.pressed = ev.pressed
+            report.timestamp = ev.timestamp
+            return report
         return ev
 
+    def scan_into(self, queue):
+        '''
+        Drain the native event queue into the shared `KeyEventQueue`, keeping
+        the native timestamps. Events that don't fit stay in the native queue
+        until the next call.
+        '''
+        events = self.keypad.events
+        ev = self.curr_event
+        count = 0
+
+        while not queue.full() and events.get_into(ev):
+            queue.put(ev.key_number + self.offset, ev.pressed, ev.timestamp)
+            count += 1
+
+        # `overflowed` can only be reset by `clear()`, which is safe to call
+        # once the queue has been drained.
+        if events.overflowed and not events:
+            self.overflow_count += 1
+            events.clear()
+
+        return count
+
 
 class MatrixScanner(KeypadScanner):
     '''
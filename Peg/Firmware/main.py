@@ -15,6 +15,7 @@ keyboard.debug_enabled = True
 from kmk.extensions.media_keys import MediaKeys
 from kmk.handlers.sequences import simple_key_sequence
 from kmk.modules.encoder import EncoderHandler
+from kmk.kmktime import ticks_diff
 from kmk.extensions.RGB import RGB
 import microcontroller
 
@@ -24,16 +25,31 @@ rgb = RGB(
     hue_default=microcontroller.nvm[0]
 )
 
-def on_move_do(state):
-    if state is not None and state['direction'] == -1:
+# ticks_ms of the last hue change that isn't saved yet
+_hue_moved = None
+
+# Writing the NVM is slow and wears the flash, only save the hue once the knob
+# came to rest for a second. Checked every loop, so turning the knob doesn't
+# have to schedule anything.
+def save_hue(sandbox):
+    global _hue_moved
+    if _hue_moved is not None and ticks_diff(supervisor.ticks_ms(), _hue_moved) >= 1000:
+        _hue_moved = None
+        if microcontroller.nvm[0] != rgb.hue:
+            microcontroller.nvm[0] = rgb.hue
+
+def on_move_do(keyboard, encoder_id, state):
+    global _hue_moved
+    if state.direction == -1:
         rgb.decrease_hue()
     else:
         rgb.increase_hue()
-    microcontroller.nvm[0] = rgb.hue
+    _hue_moved = supervisor.ticks_ms()
 
 encoder_handler = EncoderHandler()
 encoder_handler.pins = ((keyboard.rgb_encoder_a, keyboard.rgb_encoder_b, None, False),)
-encoder_handler.on_move_do = lambda x, y, state: on_move_do(state)
+encoder_handler.on_move_do = on_move_do
+encoder_handler.after_hid_send = save_hue
 
 encoder_handler.map =   [ ((KC.RGB_HUD, KC.RGB_HUI, KC.RGB_TOG),), ]
 keyboard.extensions.append(MediaKeys())